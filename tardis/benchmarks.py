@@ -0,0 +1,374 @@
+"""
+Benchmarks for filters and their inner hot functions.
+
+Each case runs in a forked process so that peak RSS and subprocess
+counts are its own. Inputs are the test assets plus synthetic files
+whose size grows with the scale argument. Run with:
+
+    python manage.py benchmark --scale 2 --json results.json
+"""
+import os
+import sys
+import json
+import time
+import resource
+import platform
+import traceback
+import subprocess
+import multiprocessing
+from contextlib import contextmanager
+
+import numpy as np
+
+from django.conf import settings
+from django.test import override_settings
+
+from tardis.filters.helpers import safe_import
+from tardis.filters.mytardisbf.contrast import stretch_contrast
+from tardis.filters.mytardisbf.resample import thumbnail
+from tardis.filters.diffractionimage.header import read_header
+from tardis.synthetic import write_ome_tiff, write_csv, write_xlsx, \
+    write_pdf, write_smv
+
+base_path = os.path.abspath(os.path.dirname(__file__))
+
+cases = []  # Registered (name, setup) benchmark cases
+
+
+class SkipBenchmark(Exception):
+    """Raised by a case setup when its requirements are not available"""
+
+
+def benchmark(name):
+    """
+    Register a benchmark case. The decorated setup function is called
+    with the work directory and scale, and returns the callable to time.
+    """
+    def register(setup):
+        cases.append((name, setup))
+        return setup
+    return register
+
+
+def get_assets_file(filename):
+    return os.path.join(base_path, 'tests', 'assets', filename)
+
+
+def get_filter_callable(name):
+    for filter in getattr(settings, 'POST_SAVE_FILTERS', []):
+        if filter[1][0] == name:
+            try:
+                return safe_import(filter)
+            except Exception as e:
+                raise SkipBenchmark(str(e)) from e
+    raise SkipBenchmark("No {} filter configured".format(name))
+
+
+def require_file(path):
+    if not os.path.exists(path):
+        raise SkipBenchmark("{} not found".format(path))
+
+
+def filter_call(callable, filename):
+    """Return a function running filter callable on filename"""
+    def run():
+        return callable(1, filename, os.path.join('benchmark',
+                                                  os.path.basename(filename)))
+    return run
+
+
+DIFFDUMP_OUTPUT = """Image type : adsc
+Collection date : Sun Sep 26 15:15:16 2004
+Exposure time : 1.000000 s
+Detector S/N : 457
+Wavelength : 0.953700 Ang
+Beam center : (157.500000 mm,157.500000 mm)
+Distance to detector : 200.000000 mm
+Image Size : (3072 px, 3072 px)
+Pixel Size : (0.102600 mm, 0.102600 mm)
+Oscillation (phi) : 0.000000 -> 1.000000 deg
+Two Theta value: N/A
+"""
+
+
+def get_plane(scale, dtype=np.uint16):
+    size = int(1024 * scale)
+    rng = np.random.RandomState(0)
+    return rng.randint(0, 4000, (size, size)).astype(dtype)
+
+
+# Cases
+
+@benchmark('mytardisbf.stretch_contrast')
+def bench_stretch_contrast(workdir, scale):
+    img = get_plane(scale * 2)
+    return lambda: stretch_contrast(img)
+
+
+@benchmark('mytardisbf.stretch_contrast[float32]')
+def bench_stretch_contrast_float(workdir, scale):
+    img = get_plane(scale * 2, np.float32)
+    return lambda: stretch_contrast(img)
+
+
+@benchmark('mytardisbf.thumbnail')
+def bench_thumbnail(workdir, scale):
+    img = get_plane(scale * 2, np.uint8)
+    return lambda: thumbnail(img, 256)
+
+
+@benchmark('mytardisbf.thumbnail[rgb]')
+def bench_thumbnail_rgb(workdir, scale):
+    img = np.dstack([get_plane(scale * 2, np.uint8)] * 3)
+    return lambda: thumbnail(img, 256)
+
+
+@benchmark('mytardisbf.get_preview_image[ome-tiff]')
+def bench_get_preview_image(workdir, scale):
+    # Optional, javabridge may not be installed
+    try:
+        import javabridge  # pylint: disable=C0415
+        from tardis.filters.mytardisbf import \
+            mytardisbf  # pylint: disable=C0415
+    except ImportError as e:
+        raise SkipBenchmark(str(e)) from e
+    filename = os.path.join(workdir, 'stack.ome.tif')
+    write_ome_tiff(filename, int(1024 * scale), 10)
+    mytardisbf.check_and_start_jvm()
+    if not mytardisbf.mtbf_jvm_started:
+        raise SkipBenchmark("Can't start JVM")
+
+    def run():
+        javabridge.attach()
+        try:
+            return mytardisbf.get_preview_image(filename)
+        finally:
+            javabridge.detach()
+    return run
+
+
+@benchmark('mytardisbf.filter[z-series.ome.tif]')
+def bench_bioformats_asset(workdir, scale):
+    return filter_call(get_filter_callable('Bioformats'),
+                       get_assets_file('z-series.ome.tif'))
+
+
+@benchmark('mytardisbf.filter[synthetic.ome.tif]')
+def bench_bioformats_synthetic(workdir, scale):
+    callable = get_filter_callable('Bioformats')
+    filename = os.path.join(workdir, 'synthetic.ome.tif')
+    write_ome_tiff(filename, int(1024 * scale), 10)
+    return filter_call(callable, filename)
+
+
+@benchmark('diffractionimage.parse_output')
+def bench_parse_output(workdir, scale):
+    callable = get_filter_callable('IMG')
+    iterations = int(1000 * scale)
+
+    def run():
+        for _ in range(iterations):
+            callable.parse_output(DIFFDUMP_OUTPUT)
+    return run
+
+
+@benchmark('diffractionimage.read_header')
+def bench_read_header(workdir, scale):
+    filename = os.path.join(workdir, 'header.img')
+    write_smv(filename, 64)
+    iterations = int(1000 * scale)
+
+    def run():
+        for _ in range(iterations):
+            read_header(filename)
+    return run
+
+
+@benchmark('diffractionimage.filter[synthetic.img]')
+def bench_diffraction_synthetic(workdir, scale):
+    callable = get_filter_callable('IMG')
+    require_file(callable.diffdump_path)
+    filename = os.path.join(workdir, 'synthetic.img')
+    write_smv(filename, int(1536 * scale))
+    return filter_call(callable, filename)
+
+
+@benchmark('csv.filter[sample.csv]')
+def bench_csv_asset(workdir, scale):
+    callable = get_filter_callable('CSV')
+    require_file(callable.ssconvert)
+    return filter_call(callable, get_assets_file('sample.csv'))
+
+
+@benchmark('csv.filter[wide.csv]')
+def bench_csv_synthetic(workdir, scale):
+    callable = get_filter_callable('CSV')
+    require_file(callable.ssconvert)
+    filename = os.path.join(workdir, 'wide.csv')
+    write_csv(filename, int(1000 * scale), int(200 * scale))
+    return filter_call(callable, filename)
+
+
+@benchmark('xlsx.filter[sample.xlsx]')
+def bench_xlsx_asset(workdir, scale):
+    callable = get_filter_callable('XLSX')
+    require_file(callable.ssconvert)
+    return filter_call(callable, get_assets_file('sample.xlsx'))
+
+
+@benchmark('xlsx.filter[sheets.xlsx]')
+def bench_xlsx_synthetic(workdir, scale):
+    callable = get_filter_callable('XLSX')
+    require_file(callable.ssconvert)
+    filename = os.path.join(workdir, 'sheets.xlsx')
+    write_xlsx(filename, int(10 * scale), int(500 * scale), 20)
+    return filter_call(callable, filename)
+
+
+@benchmark('pdf.filter[sample.pdf]')
+def bench_pdf_asset(workdir, scale):
+    require_file('/usr/bin/convert')
+    return filter_call(get_filter_callable('PDF'),
+                       get_assets_file('sample.pdf'))
+
+
+@benchmark('pdf.filter[pages.pdf]')
+def bench_pdf_synthetic(workdir, scale):
+    require_file('/usr/bin/convert')
+    filename = os.path.join(workdir, 'pages.pdf')
+    write_pdf(filename, int(500 * scale))
+    return filter_call(get_filter_callable('PDF'), filename)
+
+
+# Runner
+
+def get_rss_kb():
+    """Return current RSS of this process in KB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+    return None
+
+
+@contextmanager
+def count_subprocesses():
+    counter = [0]
+    popen_init = subprocess.Popen.__init__
+
+    def init(self, *args, **kwargs):
+        counter[0] += 1
+        popen_init(self, *args, **kwargs)
+
+    subprocess.Popen.__init__ = init
+    try:
+        yield counter
+    finally:
+        subprocess.Popen.__init__ = popen_init
+
+
+def run_case(setup, workdir, scale, repeat, conn):
+    """Run a case in this (forked) process and send its result to conn"""
+    result = {}
+    try:
+        metadata_path = os.path.join(workdir, 'metadata')
+        with override_settings(METADATA_STORE_PATH=metadata_path,
+                               MTBF_JVM_POOL_SIZE=0):
+            func = setup(workdir, scale)
+            result['baseline_rss_kb'] = get_rss_kb()
+            times = []
+            with count_subprocesses() as counter:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    func()
+                    times.append(time.perf_counter() - start)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        result.update({
+            'status': 'ok',
+            'repeat': repeat,
+            'wall_min': min(times),
+            'wall_mean': sum(times) / len(times),
+            'peak_rss_kb': usage.ru_maxrss,
+            'children_peak_rss_kb': children.ru_maxrss,
+            'subprocesses': counter[0] // repeat,
+        })
+    except SkipBenchmark as e:
+        result = {'status': 'skipped', 'reason': str(e)}
+    except Exception as e:
+        result = {'status': 'error', 'reason': str(e),
+                  'traceback': traceback.format_exc()}
+    conn.send(result)
+    conn.close()
+
+
+def run_benchmarks(workdir, scale=1.0, repeat=3, only=None):
+    """
+    Run registered cases, each in its own forked process
+
+    param workdir: Directory for synthetic inputs and outputs
+    type workdir: string
+
+    param scale: Size multiplier of synthetic inputs
+    type scale: float
+
+    param repeat: Number of timed runs per case
+    type repeat: int
+
+    param only: Run only cases with this substring in their name
+    type only: string
+
+    return Report with environment and per-case results
+    rtype dict
+    """
+    ctx = multiprocessing.get_context('fork')
+    results = []
+    for name, setup in cases:
+        if only and only not in name:
+            continue
+        case_dir = os.path.join(workdir, name.replace('[', '_').strip(']'))
+        os.makedirs(case_dir, exist_ok=True)
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=run_case,
+                           args=(setup, case_dir, scale, repeat, child_conn))
+        proc.start()
+        child_conn.close()
+        try:
+            result = parent_conn.recv()
+        except EOFError:
+            result = {'status': 'error',
+                      'reason': 'exit code {}'.format(proc.exitcode)}
+        proc.join()
+        result['name'] = name
+        results.append(result)
+    return {
+        'scale': scale,
+        'repeat': repeat,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def format_report(report):
+    """Return report as a text table"""
+    lines = ['%-44s %10s %10s %10s %6s' % (
+        'case', 'min (s)', 'mean (s)', 'rss (MB)', 'procs')]
+    for r in report['results']:
+        if r['status'] == 'ok':
+            lines.append('%-44s %10.4f %10.4f %10.1f %6d' % (
+                r['name'], r['wall_min'], r['wall_mean'],
+                r['peak_rss_kb'] / 1024.0, r['subprocesses']))
+        else:
+            lines.append('%-44s %s: %s' % (r['name'], r['status'],
+                                           r['reason']))
+    return '\n'.join(lines)
+
+
+def write_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
@@ -3,6 +3,7 @@ import traceback
 import logging
 
 from ..helpers import fileFilter, get_thumbnail_paths, fileoutput
+from ..metrics import timer
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +36,7 @@ class CsvImageFilter(fileFilter):
         return Extracted metadata
         rtype dict
         """
-        if not filename.lower().endswith('.csv'):
+        if not self.accepts(filename):
             return None
 
         logger.info("Applying CSV filter to {}...".format(filename))
@@ -56,19 +57,22 @@ class CsvImageFilter(fileFilter):
             logger.info("ssconvert: path={}, bin={}".format(ssconvert_path,
                                                             ssconvert_bin))
 
-            # Create PDF file from CSV file
-            fileoutput(ssconvert_path, ssconvert_bin, [filename, pdf_abs_path])
-
-            if os.path.exists(pdf_abs_path):
-                # Create thumbnail
-                fileoutput('/usr/bin', 'convert',
-                           ['-flatten -density 300 -background white',
-                            pdf_abs_path + '[0]',  # first page of PDF file
-                            thumb_abs_path])
-                # Delete PDF file
-                os.remove(pdf_abs_path)
-            else:
-                logger.error("Can't find PDF file {}".format(pdf_abs_path))
+            with timer(self.name, 'thumbnail'):
+                # Create PDF file from CSV file
+                fileoutput(ssconvert_path, ssconvert_bin,
+                           [filename, pdf_abs_path])
+
+                if os.path.exists(pdf_abs_path):
+                    # Create thumbnail
+                    fileoutput('/usr/bin', 'convert',
+                               ['-flatten -density 300 -background white',
+                                pdf_abs_path + '[0]',  # first page of PDF
+                                thumb_abs_path])
+                    # Delete PDF file
+                    os.remove(pdf_abs_path)
+                else:
+                    logger.error(
+                        "Can't find PDF file {}".format(pdf_abs_path))
 
             if os.path.exists(thumb_abs_path):
                 return self.filter_metadata({
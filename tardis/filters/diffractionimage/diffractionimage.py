@@ -40,10 +40,13 @@ import logging
 import os
 import subprocess
 import shutil
+import struct
 import sys
 import tempfile
 
 from ..helpers import fileFilter, get_thumbnail_paths
+from ..metrics import timer
+from .header import read_header
 
 logger = logging.getLogger(__name__)
 
@@ -114,21 +117,22 @@ class DiffractionImageFilter(fileFilter):
         return Extracted metadata
         rtype dict
         """
-        if not filepath.lower().endswith('.img') and \
-                not filepath.lower().endswith('.osc'):
+        if not self.accepts(filepath):
             return None
 
         logger.info(
             "Applying Diffraction Image filter to {}...".format(filepath))
 
         try:
-            metadata = self.getDiffractionImageMetadata(filepath)
+            with timer(self.name, 'extract'):
+                metadata = self.getDiffractionImageMetadata(filepath)
 
             thumb_rel_path, thumb_abs_path = \
                 get_thumbnail_paths(df_id, filepath, uri, ext='jpg',
                                     replace_ext=True)
-            previewImagePath = self.getDiffractionPreviewImage(
-                filepath, thumb_abs_path)
+            with timer(self.name, 'thumbnail'):
+                previewImagePath = self.getDiffractionPreviewImage(
+                    filepath, thumb_abs_path)
 
             if previewImagePath:
                 metadata['previewImage'] = thumb_rel_path
@@ -141,9 +145,19 @@ class DiffractionImageFilter(fileFilter):
 
     def getDiffractionImageMetadata(self, filepath):
         """Return a dictionary of the metadata.
+
+        ADSC SMV and R-AXIS headers are read in Python, other variants
+        are left to diffdump.
         """
-        ret = {}
+        try:
+            ret = read_header(filepath)
+        except (ValueError, struct.error) as e:
+            logger.debug("Can't read header of {}: {}".format(filepath, e))
+            ret = None
+        if ret is not None:
+            return ret
 
+        ret = {}
         try:
             output = self.run_diffdump(filepath)
 
@@ -0,0 +1,130 @@
+"""
+header.py
+
+Reads metadata of ADSC SMV and Rigaku R-AXIS diffraction images from
+their headers, with the same keys and value formatting as the filter
+gets from diffdump. Other variants return None and are left to diffdump.
+"""
+import re
+import struct
+
+RAXIS_HEADER_BYTES = 1024
+
+# ADSC keys needed, Rigaku SMV variants list DETECTOR_NAMES instead
+SMV_REQUIRED = ('SIZE1', 'SIZE2', 'PIXEL_SIZE', 'DISTANCE', 'WAVELENGTH',
+                'BEAM_CENTER_X', 'BEAM_CENTER_Y')
+
+SMV_RE = re.compile(r'^\s*([A-Za-z0-9_]+)\s*=\s*(.*?)\s*;?\s*$')
+
+
+def to_single(value):
+    return struct.unpack('f', struct.pack('f', float(value)))[0]
+
+
+def format_float(value):
+    """Format as diffdump does, from single precision"""
+    return '%f' % to_single(value)
+
+
+def read_header(filepath):
+    """
+    Return diffraction image metadata read from the file header
+
+    param filepath: Absolute path to a diffraction image
+    type filepath: string
+
+    return: Metadata, or None if the format variant is not supported
+    rtype: dict
+    """
+    with open(filepath, 'rb') as f:
+        header = f.read(RAXIS_HEADER_BYTES)
+        if header.startswith(b'{'):
+            match = re.search(rb'HEADER_BYTES\s*=\s*(\d+)', header[:64])
+            if match and int(match.group(1)) > len(header):
+                header += f.read(int(match.group(1)) - len(header))
+            return parse_smv(header)
+        if header.startswith(b'R-AXIS') or header.startswith(b'RAXIS'):
+            return parse_raxis(header)
+    return None
+
+
+def parse_smv(header):
+    """
+    Return metadata of an ADSC SMV header, or None for other variants
+    """
+    text = header.split(b'}', 1)[0].lstrip(b'{').decode('latin-1')
+    fields = {}
+    for line in text.splitlines():
+        match = SMV_RE.match(line)
+        if match:
+            fields[match.group(1).upper()] = match.group(2)
+    if 'DETECTOR_NAMES' in fields or \
+            not all(key in fields for key in SMV_REQUIRED):
+        return None
+
+    metadata = {
+        'imageType': 'adsc',
+        'wavelength': format_float(fields['WAVELENGTH']),
+        'directBeamXPos': format_float(fields['BEAM_CENTER_X']),
+        'directBeamYPos': format_float(fields['BEAM_CENTER_Y']),
+        'detectorDistance': format_float(fields['DISTANCE']),
+        'imageSizeX': str(int(fields['SIZE1'])),
+        'imageSizeY': str(int(fields['SIZE2'])),
+        'pixelSizeX': format_float(fields['PIXEL_SIZE']),
+        'pixelSizeY': format_float(fields['PIXEL_SIZE']),
+    }
+    if 'DATE' in fields:
+        metadata['collectionDate'] = fields['DATE']
+    if 'TIME' in fields:
+        metadata['exposureTime'] = format_float(fields['TIME'])
+    if 'DETECTOR_SN' in fields:
+        metadata['detectorSN'] = fields['DETECTOR_SN']
+    if 'OSC_START' in fields:
+        start = float(fields['OSC_START'])
+        metadata['oscillationRangeStart'] = format_float(start)
+        metadata['oscillationRangeEnd'] = format_float(
+            start + float(fields.get('OSC_RANGE', 0)))
+    if 'TWOTHETA' in fields:
+        metadata['twoTheta'] = format_float(fields['TWOTHETA'])
+    return metadata
+
+
+def parse_raxis(header):
+    """
+    Return metadata of a Rigaku R-AXIS header, or None if it doesn't
+    look valid in either byte order
+    """
+    if len(header) < RAXIS_HEADER_BYTES:
+        return None
+    for order in '><':
+        size_x, size_y = struct.unpack_from(order + 'ii', header, 768)
+        pixel_x, pixel_y = struct.unpack_from(order + 'ff', header, 776)
+        if 0 < size_x < 100000 and 0 < size_y < 100000 and \
+                0 < pixel_x < 10 and 0 < pixel_y < 10:
+            break
+    else:
+        return None
+
+    def unpack(fmt, offset):
+        return struct.unpack_from(order + fmt, header, offset)[0]
+
+    # Beam center is in pixels, converted to mm in single precision
+    beam_x = to_single(unpack('f', 540) * pixel_x)
+    beam_y = to_single(unpack('f', 544) * pixel_y)
+    return {
+        'imageType': 'raxis',
+        'collectionDate': header[256:268].decode(
+            'latin-1').strip('\0 '),
+        'exposureTime': format_float(unpack('f', 536)),
+        'wavelength': format_float(unpack('f', 292)),
+        'directBeamXPos': format_float(beam_x),
+        'directBeamYPos': format_float(beam_y),
+        'detectorDistance': format_float(unpack('f', 344)),
+        'imageSizeX': str(size_x),
+        'imageSizeY': str(size_y),
+        'pixelSizeX': format_float(pixel_x),
+        'pixelSizeY': format_float(pixel_y),
+        'oscillationRangeStart': format_float(unpack('f', 524)),
+        'oscillationRangeEnd': format_float(unpack('f', 528)),
+        'twoTheta': format_float(unpack('f', 556)),
+    }
@@ -5,6 +5,7 @@ import logging
 import re
 
 from ..helpers import fileFilter, get_thumbnail_paths, exec_command
+from ..metrics import timer
 
 logger = logging.getLogger(__name__)
 
@@ -95,7 +96,7 @@ class FcsImageFilter(fileFilter):
         return Extracted metadata
         rtype dict
         """
-        if not filename.lower().endswith('.fcs'):
+        if not self.accepts(filename):
             return None
 
         logger.info("Applying FCS filter to {}...".format(filename))
@@ -103,12 +104,14 @@ class FcsImageFilter(fileFilter):
             rsp = {}
 
             # Generate thumbnail image
-            r = run_fcsplot(self.fcsplot_path, id, filename, uri)
+            with timer(self.name, 'thumbnail'):
+                r = run_fcsplot(self.fcsplot_path, id, filename, uri)
             if r is not None:
                 rsp['previewImage'] = r
 
             # Extract metadata
-            r = run_showinf(self.showinf_path, id, filename)
+            with timer(self.name, 'extract'):
+                r = run_showinf(self.showinf_path, id, filename)
             if r is not None:
                 rsp.update(r)
 
@@ -3,14 +3,21 @@ from urllib.parse import urlparse
 from importlib import import_module
 import subprocess
 import logging
+import threading
+import uuid
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.utils.hashable import make_hashable
 
 logger = logging.getLogger(__name__)
 cache = caches['default']
 
+dispatch_index = None  # Global extension to filters index
+filter_instances = {}  # Global registry of constructed filters
+
 
 class fileFilter(object):
     """
@@ -58,6 +65,95 @@ class fileFilter(object):
 
         return metadata
 
+    def accepts(self, filename):
+        """
+        Check whether this filter is configured for the file extension
+
+        param filename: File name or path
+        type filename: string
+
+        return True if filter should process the file
+        rtype bool
+        """
+        for filter in get_filters(filename):
+            if filter[1][0] == self.name:
+                return True
+        return False
+
+
+def get_suffixes(filename):
+    """
+    Return lower-cased compound and simple suffixes of a file name,
+    longest first, e.g. 'a.ome.tiff' gives ['ome.tiff', 'tiff']
+
+    param filename: File name or path
+    type filename: string
+
+    return List of suffixes without leading dot
+    rtype list
+    """
+    parts = os.path.basename(filename).lower().lstrip('.').split('.')[1:]
+    return ['.'.join(parts[i:]) for i in range(len(parts))]
+
+
+def build_dispatch_index(filters):
+    """
+    Build dict of lower-cased suffix to list of filters handling it
+
+    param filters: POST_SAVE_FILTERS entries
+    type filters: list
+
+    return Dispatch index
+    rtype dict
+    """
+    index = {}
+    for filter in filters:
+        for ext in filter[0][1]:
+            entries = index.setdefault(ext.lower().lstrip('.'), [])
+            if filter not in entries:
+                entries.append(filter)
+    return index
+
+
+def get_dispatch_index():
+    """
+    Return dispatch index for POST_SAVE_FILTERS, building it on first use
+    """
+    global dispatch_index
+    if dispatch_index is None:
+        dispatch_index = build_dispatch_index(
+            getattr(settings, 'POST_SAVE_FILTERS', []))
+    return dispatch_index
+
+
+def reset_dispatch_index(setting, **kwargs):
+    global dispatch_index
+    if setting == 'POST_SAVE_FILTERS':
+        dispatch_index = None
+
+
+setting_changed.connect(reset_dispatch_index)
+
+
+def get_filters(filename):
+    """
+    Return filters matching any compound or simple suffix of a file name,
+    in POST_SAVE_FILTERS order
+
+    param filename: File name or path
+    type filename: string
+
+    return List of filters
+    rtype list
+    """
+    index = get_dispatch_index()
+    filters = []
+    for suffix in get_suffixes(filename):
+        for filter in index.get(suffix, []):
+            if filter not in filters:
+                filters.append(filter)
+    return filters
+
 
 def safe_import(filter):
     filter_path = filter[0][0]
@@ -86,6 +182,38 @@ def safe_import(filter):
     return filter_class(*filter_args, **filter_kwargs)
 
 
+def get_filter(filter):
+    """
+    Return constructed filter from the process registry, importing and
+    constructing it on first use
+
+    param filter: POST_SAVE_FILTERS entry, tuples or lists
+    type filter: tuple
+
+    return Filter callable
+    rtype fileFilter
+    """
+    # Lists and tuples make the same key, as filter entries come back
+    # as lists after going through the broker
+    key = make_hashable(filter)
+    instance = filter_instances.get(key)
+    if instance is None:
+        instance = safe_import(filter)
+        filter_instances[key] = instance
+    return instance
+
+
+def load_filters():
+    """
+    Construct all POST_SAVE_FILTERS into the process registry
+    """
+    for filter in getattr(settings, 'POST_SAVE_FILTERS', []):
+        try:
+            get_filter(filter)
+        except ImproperlyConfigured as e:
+            logger.error(str(e))
+
+
 def get_thumbnail_paths(
         df_id, filepath, uri, ext='png', replace_ext=False):
     basename = os.path.basename(filepath)
@@ -134,11 +262,176 @@ def textoutput(cd, execfilename, inputfilename, args=''):
 
 
 # cache.add fails if if the key already exists
-def acquire_lock(lock_id, expire=60):
-    return cache.add(lock_id, 'true', expire)
+def acquire_lock(lock_id, expire=60, backend=None):
+    """
+    Acquire lock with an owner token
+
+    return Owner token, or None if the lock is held
+    rtype string
+    """
+    backend = backend or cache
+    token = uuid.uuid4().hex
+    if backend.add(lock_id, token, expire):
+        return token
+    return None
+
+
+def get_cas_client(backend):
+    """
+    Return memcached client of a cache backend if it supports gets/cas,
+    which python-memcached does with OPTIONS cache_cas: True
+    """
+    client = getattr(backend, '_cache', None)
+    if getattr(client, 'cache_cas', False):
+        return client
+    return None
+
+
+def compare_and_set(backend, lock_id, token, expire):
+    """
+    Set lock expiry if it is held by token owner, atomically with
+    memcached gets/cas. A negative expire removes the lock.
+
+    return True if lock was held by token owner, None if the backend
+        doesn't support cas
+    rtype bool
+    """
+    client = get_cas_client(backend)
+    if client is None:
+        return None
+    key = backend.make_key(lock_id)
+    backend.validate_key(key)
+    try:
+        if client.gets(key) != token:
+            return False
+        if expire >= 0:
+            expire = backend.get_backend_timeout(expire)
+        # Fails if the lock changed hands since gets
+        return bool(client.cas(key, token, expire))
+    finally:
+        client.reset_cas()
+
+
+def renew_lock(lock_id, token, expire, backend=None):
+    """
+    Extend lock expiry if it is still held by token owner
+
+    Atomic on memcached with cache_cas enabled. On other backends the
+    check and touch are separate, so a lock that expired and was taken
+    by another owner in between can be extended for the new owner.
+
+    return True if lock was renewed
+    rtype bool
+    """
+    backend = backend or cache
+    renewed = compare_and_set(backend, lock_id, token, expire)
+    if renewed is not None:
+        return renewed
+    if backend.get(lock_id) != token:
+        return False
+    return backend.touch(lock_id, expire)
 
 
 # cache.delete() can be slow, but we have to use it
 # to take advantage of using add() for atomic locking
-def release_lock(lock_id):
-    cache.delete(lock_id)
+def release_lock(lock_id, token=None, backend=None):
+    """
+    Release lock, only if held by token owner when token is given
+
+    Atomic on memcached with cache_cas enabled, where the lock is
+    replaced by an expired entry. On other backends the check and
+    delete are separate, so a lock that expired and was taken by
+    another owner in between can be deleted.
+    """
+    backend = backend or cache
+    if token is not None:
+        released = compare_and_set(backend, lock_id, token, -1)
+        if released is not None:
+            if not released:
+                logger.warning("Lock {} is not held by owner, "
+                               "not releasing".format(lock_id))
+            return
+        if backend.get(lock_id) != token:
+            logger.warning("Lock {} is not held by owner, "
+                           "not releasing".format(lock_id))
+            return
+    backend.delete(lock_id)
+
+
+def get_lock_ttl(name, filename):
+    """
+    Return initial lease time for filter on a file, growing with file size
+
+    param name: Filter name
+    type name: string
+
+    param filename: Absolute path to a file for processing
+    type filename: string
+
+    return Lease time in seconds
+    rtype int
+    """
+    try:
+        size = os.path.getsize(filename)
+    except OSError:
+        size = 0
+    ttl = getattr(settings, 'FILTER_LOCK_TTL', 300) + \
+        getattr(settings, 'FILTER_LOCK_TTL_PER_GB', 300) * size / 1024 ** 3
+    factor = getattr(settings, 'FILTER_LOCK_TTL_FACTORS', {}).get(name, 1)
+    return int(ttl * factor)
+
+
+class LeaseLock(object):
+    """
+    Lock held for ttl seconds and renewed by a background heartbeat
+    while the holder is running, so long running filters keep their
+    lock and crashed ones lose it after ttl.
+    """
+
+    def __init__(self, lock_id, ttl, heartbeat=None, backend=None):
+        """
+        param lock_id: Lock key
+        type lock_id: string
+
+        param ttl: Lease time in seconds
+        type ttl: int
+
+        param heartbeat: Seconds between renewals, at most ttl / 3
+        type heartbeat: float
+
+        param backend: Django cache, default is the default cache
+        type backend: BaseCache
+        """
+        self.lock_id = lock_id
+        self.ttl = ttl
+        self.heartbeat = min(heartbeat or ttl, ttl / 3.0)
+        self.backend = backend or cache
+        self.token = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def acquire(self):
+        self.token = acquire_lock(self.lock_id, self.ttl, self.backend)
+        if self.token is None:
+            return False
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.renew, daemon=True)
+        self.thread.start()
+        return True
+
+    def renew(self):
+        while not self.stopped.wait(self.heartbeat):
+            if not renew_lock(self.lock_id, self.token, self.ttl,
+                              self.backend):
+                logger.warning("Lost lease on lock {}".format(self.lock_id))
+                return
+
+    def release(self):
+        if self.token is None:
+            return
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        release_lock(self.lock_id, self.token, self.backend)
+        self.token = None
@@ -0,0 +1,80 @@
+import time
+
+# Seconds between scans of the cache directory, see LRUCache.add
+SCAN_INTERVAL = 300
+
+# Eviction frees space down to this fraction of max_size
+LOW_WATER_RATIO = 0.9
+
+
+class LRUCache(object):
+    """
+    Size tracking and least recently used eviction of a cache directory.
+    Subclasses list their entries in get_entries and delete them in
+    remove_entry.
+    """
+
+    def __init__(self, path, max_size):
+        """
+        param path: Cache directory
+        type path: string
+
+        param max_size: Max total size of cache entries in bytes
+        type max_size: int
+        """
+        self.path = path
+        self.max_size = max_size
+        # Size of the cache as of the last scan plus entries added since,
+        # entries of other processes are picked up by the next scan
+        self.size = None
+        self.scanned = 0
+
+    def get_entries(self):
+        """
+        Return cache entries
+
+        return Iterable of (last use time, size in bytes, entry)
+        rtype iterable
+        """
+        raise NotImplementedError
+
+    def remove_entry(self, entry):
+        """Remove an entry returned by get_entries"""
+        raise NotImplementedError
+
+    def add(self, size):
+        """
+        Account for size bytes written to the cache. The cache is scanned
+        only when it may have grown over max_size, or to pick up entries
+        of other processes.
+
+        param size: Bytes written
+        type size: int
+        """
+        if self.size is not None and \
+                time.time() - self.scanned < SCAN_INTERVAL:
+            self.size += size
+            if self.size <= self.max_size:
+                return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries once the cache grows over
+        max_size, down to LOW_WATER_RATIO of it
+        """
+        entries = list(self.get_entries())
+        total_size = sum(size for _, size, _ in entries)
+
+        if total_size > self.max_size:
+            max_size = self.max_size * LOW_WATER_RATIO
+        else:
+            max_size = self.max_size
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total_size <= max_size:
+                break
+            self.remove_entry(entry)
+            total_size -= size
+
+        self.size = total_size
+        self.scanned = time.time()
@@ -0,0 +1,210 @@
+import os
+import time
+import socket
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+
+class Metrics(object):
+    """
+    Per-filter stage durations and result counters of this process,
+    rendered in Prometheus text format
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.exported = 0
+        self.pending = None  # Timer of a deferred export
+
+    def observe(self, filter, stage, seconds):
+        """
+        Record duration of a filter stage
+
+        param filter: Filter name
+        type filter: string
+
+        param stage: One of queue, lock, extract, thumbnail, publish, run
+        type stage: string
+
+        param seconds: Duration
+        type seconds: float
+        """
+        with self.lock:
+            h = self.histograms.setdefault(
+                (filter, stage), [[0] * len(BUCKETS), 0.0, 0])
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    h[0][i] += 1
+            h[1] += seconds
+            h[2] += 1
+
+    def inc(self, name, filter, value=1, **labels):
+        """
+        Increment a counter
+
+        param name: Counter name without prefix, e.g. results_total
+        type name: string
+
+        param filter: Filter name
+        type filter: string
+
+        param value: Increment
+        type value: int
+        """
+        key = (name, filter) + tuple(sorted(labels.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self, **labels):
+        """
+        Return metrics in Prometheus text format
+
+        param labels: Labels added to every sample, e.g. worker
+        type labels: dict
+
+        return Metrics text
+        rtype string
+        """
+        def fmt(extra):
+            items = sorted(labels.items()) + list(extra)
+            return '{%s}' % ','.join(
+                '%s="%s"' % (k, str(v).replace('"', '\\"'))
+                for k, v in items)
+
+        lines = []
+        with self.lock:
+            name = 'mytardis_filter_duration_seconds'
+            lines.append('# TYPE %s histogram' % name)
+            for (filter, stage), (buckets, total, count) in sorted(
+                    self.histograms.items()):
+                extra = [('filter', filter), ('stage', stage)]
+                for bound, n in zip(BUCKETS, buckets):
+                    lines.append('%s_bucket%s %d' % (
+                        name, fmt(extra + [('le', bound)]), n))
+                lines.append('%s_bucket%s %d' % (
+                    name, fmt(extra + [('le', '+Inf')]), count))
+                lines.append('%s_sum%s %f' % (name, fmt(extra), total))
+                lines.append('%s_count%s %d' % (name, fmt(extra), count))
+
+            types = set()
+            for key, value in sorted(self.counters.items()):
+                name = 'mytardis_filter_%s' % key[0]
+                if name not in types:
+                    lines.append('# TYPE %s counter' % name)
+                    types.add(name)
+                extra = [('filter', key[1])] + list(key[2:])
+                lines.append('%s%s %d' % (name, fmt(extra), value))
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()  # Global metrics of this process
+
+
+@contextmanager
+def timer(filter, stage):
+    """
+    Context manager recording duration of a filter stage
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        metrics.observe(filter, stage, time.time() - start)
+
+
+def get_export_path(pid=None):
+    worker = '%s-%s' % (socket.gethostname(), pid or os.getpid())
+    return worker, os.path.join(settings.METRICS_PATH,
+                                'filters-%s.prom' % worker)
+
+
+def export_metrics(force=False):
+    """
+    Write metrics of this process for the node_exporter textfile
+    collector, at most every METRICS_INTERVAL seconds unless forced.
+    A throttled export is deferred to the end of the interval, so the
+    last results of a burst are written without waiting for more tasks.
+    """
+    if not getattr(settings, 'METRICS_PATH', None):
+        return
+    interval = getattr(settings, 'METRICS_INTERVAL', 15)
+    now = time.time()
+    with metrics.lock:
+        if not force and now - metrics.exported < interval:
+            if metrics.pending is None:
+                metrics.pending = threading.Timer(
+                    metrics.exported + interval - now, export_metrics,
+                    kwargs={'force': True})
+                metrics.pending.daemon = True
+                metrics.pending.start()
+            return
+        metrics.exported = now
+        if metrics.pending is not None:
+            metrics.pending.cancel()
+            metrics.pending = None
+
+    worker, path = get_export_path()
+    try:
+        if not os.path.exists(settings.METRICS_PATH):
+            os.makedirs(settings.METRICS_PATH, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                'w', dir=settings.METRICS_PATH, delete=False) as f:
+            f.write(metrics.render(worker=worker))
+        os.replace(f.name, path)
+    except (IOError, OSError) as e:
+        logger.error("Can't export metrics: {}".format(str(e)))
+
+    remove_exited_metrics(2 * interval)
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def remove_exited_metrics(grace=0):
+    """
+    Remove exported metrics files of processes on this host which have
+    exited, once they are older than grace seconds so that their final
+    export can still be collected
+    """
+    if not getattr(settings, 'METRICS_PATH', None):
+        return
+    prefix = 'filters-%s-' % socket.gethostname()
+    try:
+        names = os.listdir(settings.METRICS_PATH)
+    except OSError:
+        return
+    now = time.time()
+    for name in names:
+        if not name.startswith(prefix) or not name.endswith('.prom'):
+            continue
+        try:
+            pid = int(name[len(prefix):-len('.prom')])
+        except ValueError:
+            continue
+        if pid == os.getpid() or is_running(pid):
+            continue
+        path = os.path.join(settings.METRICS_PATH, name)
+        try:
+            if now - os.path.getmtime(path) >= grace:
+                os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,81 @@
+import numpy as np
+
+CHUNK_SIZE = 1024 * 1024  # Pixels per chunk for histogram and lookups
+
+
+def get_lut_index(chunk):
+    """
+    Map 8/16-bit pixels to lookup table indices, signed types are
+    shifted so that indices follow value order
+    """
+    if chunk.dtype == np.int8:
+        return chunk.view(np.uint8) ^ 0x80
+    if chunk.dtype == np.int16:
+        return chunk.view(np.uint16) ^ 0x8000
+    return chunk
+
+
+def stretch_contrast(img, percentiles=None):
+    """Linear contrast stretch over the 8-bit range
+
+    8 and 16-bit images are stretched in a single histogram pass and a
+    lookup table, other types with in-place float32 operations. Constant
+    images give an all zero output.
+
+    Parameters
+    ----------
+    :param img: N x M array of grayscale image intensities
+    :type img: numpy.ndarray
+    :param percentiles: Low and high percentiles mapped to 0 and 255,
+        e.g. (0.5, 99.5) to ignore outliers. Min and max if not given.
+    :type percentiles: tuple
+
+    Returns
+    -------
+    :return: Output image with contrast stretch over the 8-bit range.
+    :rtype: numpy.ndarray (dtype = np.uint8)
+
+    """
+    low, high = percentiles or (0, 100)
+
+    if img.dtype in (np.uint8, np.int8, np.uint16, np.int16):
+        flat = img.ravel()
+        bins = 1 << (8 * img.dtype.itemsize)
+        hist = np.zeros(bins, dtype=np.int64)
+        for i in range(0, flat.size, CHUNK_SIZE):
+            hist += np.bincount(get_lut_index(flat[i:i + CHUNK_SIZE]),
+                                minlength=bins)
+        cdf = np.cumsum(hist)
+        lo = np.searchsorted(cdf, cdf[-1] * low / 100.0, side='right')
+        hi = min(np.searchsorted(cdf, cdf[-1] * high / 100.0, side='left'),
+                 bins - 1)
+
+        lut = np.zeros(bins, dtype=np.uint8)
+        if hi > lo:
+            values = np.arange(bins, dtype=np.float32)
+            values -= lo
+            values *= 255.0 / (hi - lo)
+            np.clip(values, 0, 255, out=values)
+            np.rint(values, out=values)
+            lut = values.astype(np.uint8)
+
+        out = np.empty(flat.size, dtype=np.uint8)
+        for i in range(0, flat.size, CHUNK_SIZE):
+            out[i:i + CHUNK_SIZE] = lut[get_lut_index(
+                flat[i:i + CHUNK_SIZE])]
+        return out.reshape(img.shape)
+
+    if percentiles:
+        lo, hi = np.nanpercentile(img, [low, high])
+    else:
+        lo, hi = np.nanmin(img), np.nanmax(img)
+    if not hi > lo:
+        return np.zeros(img.shape, dtype=np.uint8)
+
+    out = img.astype(np.float32)
+    out -= lo
+    out *= 255.0 / (float(hi) - float(lo))
+    np.clip(out, 0, 255, out=out)
+    np.rint(out, out=out)
+    np.nan_to_num(out, copy=False)
+    return out.astype(np.uint8)
@@ -0,0 +1,275 @@
+"""
+Pool of long-lived helper processes, each holding one warm JVM.
+
+javabridge can't restart a JVM within a process, so Bioformats work is
+sent to helper processes which keep their JVM between files and exit
+after MTBF_JVM_MAX_FILES files or once heap usage passes
+MTBF_JVM_MAX_HEAP_RATIO of the max heap. A crashed, hung or recycled
+helper is replaced on the next request.
+"""
+import os
+import sys
+import atexit
+import pickle
+import queue
+import logging
+import threading
+import subprocess
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+jvm_pool = None  # Global pool for this process, see get_jvm_pool
+
+base_path = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+
+
+class JVMWorker(object):
+    """
+    Helper process running get_meta requests read from its stdin
+    """
+
+    def __init__(self, module, max_files, max_heap_ratio, timeout=None):
+        """
+        param module: Helper module run with python -m
+        type module: string
+
+        param max_files: Files after which the helper exits
+        type max_files: int
+
+        param max_heap_ratio: Heap usage ratio after which the helper exits
+        type max_heap_ratio: float
+
+        param timeout: Seconds after which a request is abandoned and the
+            helper killed, None for no limit
+        type timeout: float
+        """
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'tardis.settings')
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, [base_path, env.get('PYTHONPATH')]))
+        # The helper outlives this call, it's closed by close()
+        self.proc = subprocess.Popen(  # pylint: disable=R1732
+            [sys.executable, '-m', module, str(max_files),
+             str(max_heap_ratio)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env)
+        self.timeout = timeout
+        self.timed_out = False
+        self.alive = True
+
+    def kill(self):
+        self.timed_out = True
+        self.proc.kill()
+
+    def submit(self, args, kwargs):
+        """
+        Run get_meta in the helper process
+
+        return Result of get_meta
+        rtype list
+        """
+        # A hung helper is killed, which ends the read below
+        timer = None
+        if self.timeout:
+            timer = threading.Timer(self.timeout, self.kill)
+            timer.daemon = True
+            timer.start()
+        try:
+            pickle.dump((args, kwargs), self.proc.stdin)
+            self.proc.stdin.flush()
+            result, error, recycle = pickle.load(self.proc.stdout)
+        except (EOFError, OSError, pickle.UnpicklingError) as e:
+            self.close()
+            if self.timed_out:
+                raise Exception("JVM worker process timed out after "
+                                "{} seconds".format(self.timeout)) from e
+            raise Exception("JVM worker process exited unexpectedly") from e
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if recycle:
+            logger.debug("Recycling JVM worker pid={}".format(self.proc.pid))
+            self.close()
+        if error is not None:
+            raise Exception(error)
+        return result
+
+    def close(self):
+        self.alive = False
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proc.kill()
+
+
+class JVMPool(object):
+    """
+    Fixed size pool of JVM workers, started on demand
+    """
+
+    def __init__(self, size, module='tardis.filters.mytardisbf.jvmpool'):
+        self.size = size
+        self.module = module
+        self.idle = queue.Queue()
+        self.started = 0
+        self.lock = threading.Lock()
+
+    def spawn(self):
+        return JVMWorker(
+            self.module,
+            getattr(settings, 'MTBF_JVM_MAX_FILES', 100),
+            getattr(settings, 'MTBF_JVM_MAX_HEAP_RATIO', 0.8),
+            getattr(settings, 'MTBF_JVM_TIMEOUT', None))
+
+    def acquire(self):
+        with self.lock:
+            if not self.idle.empty() or self.started >= self.size:
+                spawn = False
+            else:
+                self.started += 1
+                spawn = True
+        if not spawn:
+            return self.idle.get()
+        try:
+            return self.spawn()
+        except Exception:
+            with self.lock:
+                self.started -= 1
+            # Wake up a waiting caller, it will try to start a worker
+            self.idle.put(None)
+            raise
+
+    def release(self, worker):
+        if worker.alive:
+            self.idle.put(worker)
+        else:
+            with self.lock:
+                self.started -= 1
+            # Wake up a waiting caller, it will start a new worker
+            self.idle.put(None)
+
+    def get_meta(self, *args, **kwargs):
+        """
+        Submit get_meta to an idle worker, blocking until one is free
+        """
+        worker = self.acquire()
+        while worker is None:
+            worker = self.acquire()
+        try:
+            return worker.submit(args, kwargs)
+        finally:
+            self.release(worker)
+
+    def close(self):
+        while not self.idle.empty():
+            worker = self.idle.get()
+            if worker is not None:
+                worker.close()
+
+
+def get_jvm_pool():
+    """
+    Return JVM pool for this process, or None if MTBF_JVM_POOL_SIZE is 0
+    and the JVM runs in-process
+    """
+    global jvm_pool
+    size = getattr(settings, 'MTBF_JVM_POOL_SIZE', 1)
+    if not size:
+        return None
+    if jvm_pool is None:
+        jvm_pool = JVMPool(size)
+        atexit.register(jvm_pool.close)
+    return jvm_pool
+
+
+def get_heap_ratio():
+    """Return used JVM heap as a fraction of max heap"""
+    # Only the helper process loads javabridge and starts a JVM
+    import javabridge  # pylint: disable=C0415
+    runtime = javabridge.static_call(
+        "java/lang/Runtime", "getRuntime", "()Ljava/lang/Runtime;")
+    total = javabridge.call(runtime, "totalMemory", "()J")
+    free = javabridge.call(runtime, "freeMemory", "()J")
+    limit = javabridge.call(runtime, "maxMemory", "()J")
+    return float(total - free) / float(limit)
+
+
+def get_streams():
+    """
+    Return request and result streams of a helper process. stdout is
+    kept for results only, other output goes to stderr.
+    """
+    out = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    return sys.stdin.buffer, out
+
+
+def serve(inp, out, run, max_files, is_full=None):
+    """
+    Run requests read from inp until it's closed, max_files requests
+    were served or is_full returns True
+
+    param run: Function called with request args and kwargs
+    type run: function
+
+    param is_full: Function returning whether the helper should exit
+    type is_full: function
+    """
+    files = 0
+    while True:
+        try:
+            args, kwargs = pickle.load(inp)
+        except EOFError:
+            break
+        result, error = None, None
+        try:
+            result = run(*args, **kwargs)
+        except Exception as e:
+            error = str(e)
+        files += 1
+        recycle = files >= max_files
+        if not recycle and is_full is not None:
+            recycle = is_full()
+        pickle.dump((result, error, recycle), out)
+        out.flush()
+        if recycle:
+            break
+
+
+def main():
+    # Only the helper process loads javabridge and starts a JVM, and
+    # mytardisbf needs Django set up first
+    import django  # pylint: disable=C0415
+    django.setup()
+
+    import javabridge  # pylint: disable=C0415
+    from tardis.filters.mytardisbf import \
+        mytardisbf  # pylint: disable=C0415
+
+    max_files = int(sys.argv[1])
+    max_heap_ratio = float(sys.argv[2])
+
+    def is_full():
+        if not mytardisbf.mtbf_jvm_started:
+            return False
+        javabridge.attach()
+        try:
+            return get_heap_ratio() > max_heap_ratio
+        finally:
+            javabridge.detach()
+
+    inp, out = get_streams()
+    try:
+        serve(inp, out, mytardisbf.run_get_meta, max_files, is_full)
+    finally:
+        if mytardisbf.mtbf_jvm_started:
+            javabridge.kill_vm()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+from django.conf import settings
+
+from ..lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+memo_cache = None  # Global memo cache, see get_memo_cache
+
+
+class MemoCache(LRUCache):
+    """
+    Directories for Bio-Formats Memoizer files. Each file gets its own
+    directory keyed by path, size and mtime, so changed files are parsed
+    again. Least recently used directories are evicted once the cache
+    grows over max_size bytes, checked only after new memo files were
+    written.
+    """
+
+    def get_key(self, filename):
+        st = os.stat(filename)
+        return hashlib.sha256(json.dumps(
+            [os.path.abspath(filename), st.st_size, st.st_mtime_ns]).encode(
+                'utf-8')).hexdigest()
+
+    def get_directory(self, filename):
+        """
+        Return memo directory of a file, marked as recently used
+
+        param filename: Absolute path to a file
+        type filename: string
+
+        return Directory path
+        rtype string
+        """
+        key = self.get_key(filename)
+        directory = os.path.join(self.path, key[:2], key)
+        os.makedirs(directory, exist_ok=True)
+        os.utime(directory)
+        return directory
+
+    def get_size(self, directory):
+        """
+        Return total size of the memo files in a directory. Memoizer
+        writes them under the absolute path of the file read, in nested
+        directories.
+        """
+        size = 0
+        for root, _, files in os.walk(directory):
+            for name in files:
+                try:
+                    size += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return size
+
+    def update(self, directory, size):
+        """
+        Account for memo files written to a directory, evicting if the
+        cache may have grown over max_size
+
+        param directory: Memo directory of a file
+        type directory: string
+
+        param size: Size of the directory before the file was read
+        type size: int
+        """
+        added = self.get_size(directory) - size
+        if added > 0:
+            self.add(added)
+
+    def get_entries(self):
+        """
+        Return memo directories, used as of their mtime
+
+        return Iterable of (mtime, size, directory)
+        rtype iterable
+        """
+        if not os.path.isdir(self.path):
+            return []
+        entries = []
+        for prefix in os.listdir(self.path):
+            if not os.path.isdir(os.path.join(self.path, prefix)):
+                continue
+            for key in os.listdir(os.path.join(self.path, prefix)):
+                directory = os.path.join(self.path, prefix, key)
+                try:
+                    mtime = os.stat(directory).st_mtime
+                except OSError:
+                    continue
+                entries.append((mtime, self.get_size(directory), directory))
+        return entries
+
+    def remove_entry(self, entry):
+        logger.debug("Evicting memo {}".format(entry))
+        shutil.rmtree(entry, ignore_errors=True)
+
+
+def get_memo_cache():
+    """
+    Return memo cache configured in settings, or None if disabled
+    """
+    global memo_cache
+    if not getattr(settings, 'MTBF_MEMO_PATH', None):
+        return None
+    if memo_cache is None:
+        memo_cache = MemoCache(
+            settings.MTBF_MEMO_PATH,
+            getattr(settings, 'MTBF_MEMO_MAX_SIZE', 1024 ** 3))
+    return memo_cache
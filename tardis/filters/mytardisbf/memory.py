@@ -0,0 +1,83 @@
+"""
+JVM heap sizing from the memory available to the container.
+"""
+import os
+import re
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# cgroup v2 and v1 memory limit files
+CGROUP_LIMIT_PATHS = (
+    '/sys/fs/cgroup/memory.max',
+    '/sys/fs/cgroup/memory/memory.limit_in_bytes',
+)
+
+MIN_HEAP_SIZE = 256 * 1024 ** 2
+
+UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
+
+def parse_size(size):
+    """
+    Parse a JVM style memory size such as '512m' or '4G' into bytes
+    """
+    match = re.match(r'^\s*(\d+)\s*([kmgt]?)b?\s*$', str(size), re.I)
+    if match is None:
+        raise ValueError("Invalid memory size %s" % size)
+    return int(match.group(1)) * UNITS[match.group(2).lower()]
+
+
+def get_physical_memory():
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+
+def get_memory_limit():
+    """
+    Return memory limit of this container from cgroups, or physical
+    memory when unlimited
+
+    return: Memory limit in bytes
+    rtype: int
+    """
+    physical = get_physical_memory()
+    for path in CGROUP_LIMIT_PATHS:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except (IOError, OSError):
+            continue
+        if value == 'max':
+            break
+        try:
+            # cgroup v1 reports a huge number when unlimited
+            return min(int(value), physical)
+        except ValueError:
+            continue
+    return physical
+
+
+def get_max_heap_size():
+    """
+    Return JVM max heap size for javabridge. MTBF_MAX_HEAP_SIZE is used
+    as is unless 'auto', in which case MTBF_HEAP_MEMORY_RATIO of the
+    container memory limit is shared by the JVMs of all worker processes.
+
+    return: Heap size, e.g. '1024m'
+    rtype: string
+    """
+    size = getattr(settings, 'MTBF_MAX_HEAP_SIZE', 'auto')
+    if size != 'auto':
+        return size
+
+    concurrency = getattr(settings, 'MTBF_WORKER_CONCURRENCY', None) or \
+        os.cpu_count() or 1
+    jvms = concurrency * max(1, getattr(settings, 'MTBF_JVM_POOL_SIZE', 1))
+    limit = get_memory_limit()
+    ratio = getattr(settings, 'MTBF_HEAP_MEMORY_RATIO', 0.5)
+    heap = max(MIN_HEAP_SIZE, int(limit * ratio / jvms))
+    logger.debug("JVM heap %sm for %s JVMs within %sm", heap // 1024 ** 2,
+                 jvms, limit // 1024 ** 2)
+    return '%dm' % (heap // 1024 ** 2)
@@ -1,10 +1,9 @@
 import os
+import time
 import traceback
 import logging
-
-from xml.etree import ElementTree as et
-import numpy as np
-from scipy.ndimage import zoom
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import javabridge
 import bioformats
@@ -12,6 +11,16 @@ import bioformats
 from django.conf import settings
 
 from ..helpers import fileFilter, get_thumbnail_paths
+from ..metrics import timer
+from .jvmpool import get_jvm_pool
+from .reader import BioformatsReader, PlaneTooLarge, get_max_heap
+from .memory import get_max_heap_size
+from .memo import get_memo_cache
+from .native import get_native_meta
+from .preview import make_preview, write_preview, get_preview_series, \
+    get_preview_policy
+from .projection import get_projection_planes, get_projection_mode, \
+    project
 
 logger = logging.getLogger(__name__)
 
@@ -56,30 +65,14 @@ def check_and_start_jvm():
     if not mtbf_jvm_started:
         logger.debug('Starting a new JVM')
         try:
-            mh_size = getattr(settings, 'MTBF_MAX_HEAP_SIZE', '4G')
             javabridge.start_vm(class_path=bioformats.JARS,
-                                max_heap_size=mh_size,
+                                max_heap_size=get_max_heap_size(),
                                 run_headless=True)
             mtbf_jvm_started = True
         except javabridge.JVMNotFoundError as e:
             logger.debug(e)
 
 
-def get_namespaces(meta_xml_root):
-    """
-    Extract OME and StructuredAnnotation namespaces from OME-XML file
-
-    param meta_xml_root: Root ElementTree element
-    type meta_xml_root: element
-
-    return: Dictionary with the OME and SA namespaces
-    rtype: dict
-    """
-    ome_ns = meta_xml_root.tag[1:].split("}", 1)[0]
-    sa_ns = ome_ns.replace("OME", "SA")
-    return {'ome': ome_ns, 'sa': sa_ns}
-
-
 def get_meta(input_file_path, output_path, **kwargs):
     """
     Extract specific metadata typically used in bio-image analysis. Also
@@ -98,80 +91,127 @@ def get_meta(input_file_path, output_path, **kwargs):
     rtype: dict
 
     """
-    pix_exc = set(["id", "significantbits", "bigendian", "interleaved"])
-    channel_exc = set(["color", "id", "color", "contrastmethod", "fluor",
-                       "ndfilter", "illuminationtype", "name",
-                       "pockelcellsetting", "acquisitionmode"])
-
+    # Reuse reader state of slow formats across runs
+    memo_cache = get_memo_cache()
+    memo_dir = None
+    if memo_cache is not None:
+        memo_dir = memo_cache.get_directory(input_file_path)
+        memo_size = memo_cache.get_size(memo_dir)
+
+    # Reader and parsed metadata are shared by all series
     try:
-        omexml = bioformats.get_omexml_metadata(input_file_path).encode('utf-8')
+        reader = BioformatsReader(
+            input_file_path, memo_dir,
+            getattr(settings, 'MTBF_MEMO_MIN_ELAPSED', 100))
     except javabridge.jutil.JavaException:
         logger.error("Unable to read OME Metadata from: %s", input_file_path)
         return None
 
+    try:
+        with reader:
+            return get_series_meta(reader, input_file_path, output_path)
+    finally:
+        if memo_cache is not None:
+            memo_cache.update(memo_dir, memo_size)
+
+
+def get_series_meta(reader, input_file_path, output_path):
+    """
+    Extract metadata of each series of a file and save preview images of
+    the series selected by MTBF_PREVIEW_SERIES
+
+    param reader: Open reader of the input file
+    type reader: BioformatsReader
+
+    return: List of dicts containing with keys and values for specific metadata
+    rtype: list
+    """
     input_fname, _ = os.path.splitext(os.path.basename(input_file_path))
 
-    meta_xml = et.fromstring(omexml)
-    ome_ns = get_namespaces(meta_xml)
+    percentiles = getattr(settings, 'MTBF_CONTRAST_PERCENTILES', None)
+
+    # Previews are only made of selected series and within a time budget,
+    # metadata of other series is collected without reading pixels
+    policy = get_preview_policy(
+        getattr(settings, 'MTBF_PREVIEW_SERIES', 'first'))
+    preview_series = set(get_preview_series(
+        reader.get_series_count(), policy,
+        getattr(settings, 'MTBF_PREVIEW_SERIES_COUNT', 1)))
+    budget = getattr(settings, 'MTBF_PREVIEW_TIME_BUDGET', None)
+    start = time.time()
+
+    # Planes are read on this thread, which is attached to the JVM.
+    # Previews are optionally made and saved on a thread pool meanwhile.
+    threads = getattr(settings, 'MTBF_PREVIEW_THREADS', 0)
+    executor = ThreadPoolExecutor(threads) if threads else None
+    pending = deque()
+
     meta = list()
-    for i, img_meta in enumerate(meta_xml.findall('ome:Image', ome_ns)):
-        smeta = dict()
-        output_file_path = os.path.join(output_path,
-                                        input_fname + "_s%s.png" % i)
-        logger.debug("Generating series %s preview from image: %s",
-                     i, input_file_path)
-        img = get_preview_image(input_file_path, omexml, series=i)
-        logger.debug("Saving series %s preview from image: %s",
-                     i, input_file_path)
-        save_image(img, output_file_path, overwrite=True)
-        logger.debug("Extracting metadata for series %s preview from image: %s",
-                     i, input_file_path)
-        smeta['id'] = img_meta.attrib['ID']
-        smeta['name'] = img_meta.attrib['Name']
-        smeta['previewImage'] = output_file_path
-        for pix_meta in img_meta.findall('ome:Pixels', ome_ns):
-            for k, v in pix_meta.attrib.items():
-                if k.lower() not in pix_exc:
-                    smeta[k.lower()] = v
-
-            for c, channel_meta in enumerate(
-                    pix_meta.findall('ome:Channel', ome_ns)):
-                for kc, vc in channel_meta.attrib.items():
-                    if kc.lower() in channel_exc:
-                        continue
-                    if kc.lower() not in smeta:
-                        smeta[kc.lower()] = ["Channel %s: %s" % (c, vc)]
-                    else:
-                        smeta[kc.lower()].append("Channel %s: %s" % (c, vc))
-
-        meta.append(smeta)
+    try:
+        for i, smeta in enumerate(reader.iter_series_meta()):
+            meta.append(smeta)
+            if i not in preview_series:
+                continue
+            if budget and time.time() - start > budget:
+                logger.warning("Preview time budget exceeded for %s, "
+                               "skipping series %s and later",
+                               input_file_path, i)
+                preview_series = set()
+                continue
+            output_file_path = os.path.join(output_path,
+                                            input_fname + "_s%s.png" % i)
+            logger.debug("Generating series %s preview from image: %s",
+                         i, input_file_path)
+            try:
+                img, rgb = read_preview_plane(reader, i)
+            except PlaneTooLarge as e:
+                # Metadata only
+                logger.warning(str(e))
+                continue
+            args = (img, output_file_path, 256, rgb, percentiles)
+            if executor is None:
+                write_preview(*args)
+            else:
+                # Bound planes held in memory
+                if len(pending) >= threads:
+                    pending.popleft().result()
+                pending.append(executor.submit(write_preview, *args))
+            smeta['previewImage'] = output_file_path
+
+        while pending:
+            pending.popleft().result()
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     return meta
 
 
-def stretch_contrast(img):
-    """Simple linear contrast stretch
+def run_get_meta(input_file_path, output_path, **kwargs):
+    """
+    Run get_meta on the JVM of this process, starting it if needed. The
+    JVM is kept running for subsequent calls.
 
-    Parameters
-    ----------
-    :param img: N x M array of grayscale image intensities
-    :type img: numpy.ndarray
+    param input_file_path: Path to the input file
+    type input_file_path: string
 
-    Returns
-    -------
-    :return: Output image with contrast stretch over the 8-bit range.
-    :rtype: numpy.ndarray (dtype = np.int8)
+    param output_path: Path to the output directory
+    type output_path: string
 
+    return: List of dicts with series metadata
+    rtype: list
     """
+    check_and_start_jvm()
 
-    s = np.subtract(img, np.min(img))
-    p = 255.0 / (np.max(img) - np.min(img))
-    out = np.round(np.multiply(s, p)).astype(np.uint8)
-
-    return out
+    javabridge.attach()
+    try:
+        shush_logger()
+        return get_meta(input_file_path, output_path, **kwargs)
+    finally:
+        javabridge.detach()
 
 
-def get_preview_image(fname, meta_xml=None, maxwh=256, series=0):
+def get_preview_image(fname, reader=None, maxwh=256, series=0):
     """ Generate a thumbnail of an image at the specified path. Gets the
     middle Z plane of channel=0 and timepoint=0 of the specified series.
 
@@ -179,8 +219,9 @@ def get_preview_image(fname, meta_xml=None, maxwh=256, series=0):
     ----------
     :param fname: Path to image file.
     :type fname: string
-    :param meta_xml: OME XML metadata.
-    :type meta_xml: string
+    :param reader: Open reader of the image file, opened and closed here
+        if not given.
+    :type reader: BioformatsReader
     :param maxwh: Maximum width or height of the output thumbnail. If the
         extracted image is larger in either x or y, the image will will be
         downsized to fit.
@@ -198,76 +239,68 @@ def get_preview_image(fname, meta_xml=None, maxwh=256, series=0):
     """
     name, ext = os.path.splitext(os.path.basename(fname))
 
-    if ext[1:] not in bioformats.READABLE_FORMATS:
+    if ext[1:].lower() not in bioformats.READABLE_FORMATS:
         raise Exception("Format not supported: %s" % ext[1:])
 
-    if not meta_xml:
-        meta_xml = bioformats.get_omexml_metadata(fname)
-
-    ome = bioformats.OMEXML(meta_xml.decode('utf-8'))
+    if reader is None:
+        with BioformatsReader(fname) as opened:
+            return get_preview_image(fname, opened, maxwh, series)
 
-    if series > ome.get_image_count():
+    if series >= reader.get_series_count():
         raise Exception("Specified series number %s exceeds number of series "
                         "in the image file: %s" % (series, fname))
 
-    # Get metadata for first series
-    meta = ome.image(0).Pixels
-
-    # Determine resize factor
-    sizex = meta.SizeX
-    sizey = meta.SizeY
-    if sizex > maxwh or sizey > maxwh:
-        f = min(float(maxwh) / float(sizex), float(maxwh) / float(sizey))
-    else:
-        f = max(float(maxwh) / float(sizex), float(maxwh) / float(sizey))
-
-    # Determine which Z slice
-    z = 0
-
-    # Determine middle Z plane
-    # Note: SizeZ doesn't seem to be reliable. Might need to check BF.
-    # Stick with first slice for now.
-    # if meta.SizeZ > 1:
-    #     z = int(math.floor(float(meta.SizeZ)/2))
-
-    # Load image plane
-    if meta.channel_count == 1 and meta.SizeC == 4:
-        # RGB Image
-        img = bioformats.load_image(fname, t=0, z=z, series=series,
-                                    rescale=False)
-        return zoom(img, (f, f, 1))
-
-    # Grayscale, grab channel 0 only
-    img = bioformats.load_image(fname, c=0, t=0, z=z, series=series,
-                                rescale=False)
-    # if img.dtype in (np.uint16, np.uint32, np.int16, np.int32):
-    img = stretch_contrast(img)
-    return zoom(img, f)
-
-
-def save_image(img, output_path, overwrite=False):
-    """
-    Extract and save a preview image for an input image
+    img, rgb = read_preview_plane(reader, series, maxwh)
+    return make_preview(img, maxwh, rgb,
+                        getattr(settings, 'MTBF_CONTRAST_PERCENTILES', None))
 
-    param img: N x M array of grayscale pixel intentsities.
-    type img: ndarray
 
-    param output_path: Path to which the output file is to be saved.
-    type output_path: string
+def read_preview_plane(reader, series, maxwh=256):
+    """
+    Read the plane of a series a preview is made of, reduced to no less
+    than maxwh. This is the first Z plane and timepoint, or the projection
+    of sampled planes when MTBF_PREVIEW_PROJECTION is set. Must be called
+    on a thread attached to the JVM.
 
-    param overwrite: Specifies whether or not to overwrite an existing file if
-        a file already exist at the output path.
-    type overwrite: bool
+    param reader: Open reader of the image file
+    type reader: BioformatsReader
 
-    raises Exception: bla
-    """
-    if os.path.exists(output_path):
-        if not overwrite:
-            raise Exception("Ouput file %s already exists and parameter"
-                            "overwrite=False" % output_path)
-        os.remove(output_path)
+    return: Plane and whether it is RGB
+    rtype: tuple
 
-    bioformats.write_image(output_path, img, bioformats.PT_UINT8)
+    raises PlaneTooLarge: if the plane is larger than
+        MTBF_MAX_PREVIEW_PLANE_BYTES at all resolution levels
+    """
+    # Load image plane, from a lower resolution level or in reduced tiles
+    # for large planes. Single reads are bounded by the JVM heap, so any
+    # plane can be read in tiles unless MTBF_MAX_PREVIEW_PLANE_BYTES is set.
+    heap = get_max_heap()
+    max_bytes = min(getattr(settings, 'MTBF_MAX_PLANE_BYTES', None) or heap,
+                    heap // 4)
+    max_plane_bytes = getattr(settings, 'MTBF_MAX_PREVIEW_PLANE_BYTES', None)
+    rgb = reader.get_channel_count(series) == 1 and \
+        reader.get_size_c(series) == 4
+    # RGB images are read with all channels, grayscale channel 0 only
+    c = None if rgb else 0
+
+    # Z=0 is often blank in stacks, optionally project planes instead
+    projection = get_projection_mode(
+        getattr(settings, 'MTBF_PREVIEW_PROJECTION', None))
+    if projection:
+        size_z, size_t = reader.get_size_zt(series)
+        planes = get_projection_planes(
+            size_z, size_t,
+            getattr(settings, 'MTBF_PREVIEW_PROJECTION_MAX_PLANES', 16),
+            getattr(settings, 'MTBF_PREVIEW_PROJECTION_OVER_T', False))
+        if len(planes) > 1:
+            return project((reader.read_preview(
+                series, maxwh, c=c, z=z, t=t, max_bytes=max_bytes,
+                max_plane_bytes=max_plane_bytes)
+                for z, t in planes), projection), rgb
+
+    return reader.read_preview(series, maxwh, c=c, t=0, z=0,
+                               max_bytes=max_bytes,
+                               max_plane_bytes=max_plane_bytes), rgb
 
 
 class BioformatsFilter(fileFilter):
@@ -300,26 +333,31 @@ class BioformatsFilter(fileFilter):
         rtype dict
         """
 
-        _, extension = os.path.splitext(filename)
-        if extension[1:] not in bioformats.READABLE_FORMATS:
+        if not self.accepts(filename):
             return None
 
         logger.info("Applying Bioformats filter to {}...".format(filename))
 
-        # Need to start a JVM in each thread
-        check_and_start_jvm()
-
         try:
-            javabridge.attach()
-            shush_logger()
-
             thumb_rel_path, thumb_abs_path = get_thumbnail_paths(id, filename,
                                                                  uri)
 
             if not os.path.exists(os.path.dirname(thumb_abs_path)):
                 os.makedirs(os.path.dirname(thumb_abs_path))
 
-            rsp = get_meta(filename, os.path.dirname(thumb_abs_path), **kwargs)
+            # Read simple images natively, otherwise run on a pooled JVM
+            # worker process if configured. Previews are generated along
+            # with metadata.
+            jvm_pool = get_jvm_pool()
+            with timer(self.name, 'extract'):
+                rsp = get_native_meta(filename,
+                                      os.path.dirname(thumb_abs_path))
+                if rsp is None and jvm_pool is not None:
+                    rsp = jvm_pool.get_meta(
+                        filename, os.path.dirname(thumb_abs_path), **kwargs)
+                elif rsp is None:
+                    rsp = run_get_meta(
+                        filename, os.path.dirname(thumb_abs_path), **kwargs)
             if rsp is not None:
                 metadata = []
                 for i in rsp:
@@ -329,9 +367,6 @@ class BioformatsFilter(fileFilter):
         except Exception as e:
             logger.error(str(e))
             logger.debug(traceback.format_exc())
-        finally:
-            javabridge.detach()
-            javabridge.kill_vm()
 
         return None
 
@@ -0,0 +1,118 @@
+"""
+Metadata and previews of simple 2D raster images read with Pillow,
+without starting a JVM. Files this can't handle, such as OME-TIFF,
+multi-page or very large images, are left to Bio-Formats.
+"""
+import os
+import logging
+import warnings
+
+import numpy as np
+from PIL import Image
+
+from django.conf import settings
+
+from .preview import make_preview, save_image
+
+logger = logging.getLogger(__name__)
+
+# Pillow mode to OME pixel type and samples per pixel
+MODES = {
+    '1': ('bit', 1),
+    'L': ('uint8', 1),
+    'P': ('uint8', 3),
+    'LA': ('uint8', 2),
+    'RGB': ('uint8', 3),
+    'RGBA': ('uint8', 4),
+    'I;16': ('uint16', 1),
+    'I;16L': ('uint16', 1),
+    'I;16B': ('uint16', 1),
+    'I': ('int32', 1),
+    'F': ('float', 1),
+}
+
+BYTES = {'bit': 1, 'uint8': 1, 'uint16': 2, 'int32': 4, 'float': 4}
+
+
+def is_ome_tiff(img):
+    description = img.tag_v2.get(270, '') if img.format == 'TIFF' else ''
+    if isinstance(description, bytes):
+        description = description.decode('latin-1')
+    return '<OME' in description
+
+
+def get_native_meta(input_file_path, output_path, maxwh=256):
+    """
+    Extract metadata and save a preview image of a single-series 2D
+    image, in the same form as get_meta
+
+    param input_file_path: Path to the input file
+    type input_file_path: string
+
+    param output_path: Directory the preview image is saved in
+    type output_path: string
+
+    return: List with the metadata dict of the image, or None if the
+        file has to be read with Bio-Formats
+    rtype: list
+    """
+    name = os.path.basename(input_file_path)
+    _, ext = os.path.splitext(name)
+    if ext[1:].lower() not in getattr(settings, 'MTBF_NATIVE_FORMATS', []):
+        return None
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            img = Image.open(input_file_path)
+    except Exception as e:
+        logger.debug("Can't read %s natively: %s", input_file_path, e)
+        return None
+
+    with img:
+        if img.mode not in MODES or getattr(img, 'n_frames', 1) > 1 or \
+                is_ome_tiff(img):
+            return None
+        pixel_type, samples = MODES[img.mode]
+        sizex, sizey = img.size
+        plane_bytes = sizex * sizey * samples * BYTES[pixel_type]
+        max_bytes = getattr(settings, 'MTBF_MAX_PLANE_BYTES', None)
+        if max_bytes and plane_bytes > max_bytes and img.format != 'JPEG':
+            return None
+
+        smeta = dict()
+        smeta['id'] = 'Image:0'
+        smeta['name'] = name
+        smeta['dimensionorder'] = 'XYCZT'
+        smeta['type'] = pixel_type
+        smeta['sizex'] = str(sizex)
+        smeta['sizey'] = str(sizey)
+        smeta['sizez'] = '1'
+        smeta['sizec'] = str(samples)
+        smeta['sizet'] = '1'
+        smeta['samplesperpixel'] = ["Channel 0: %s" % samples]
+
+        try:
+            # JPEG is decoded at a reduced scale still covering maxwh
+            img.draft(img.mode, (maxwh, maxwh))
+            if img.mode == 'P':
+                img = img.convert('RGB')
+            elif img.mode == '1':
+                img = img.convert('L')
+            elif img.mode == 'LA':
+                img = img.convert('L')
+            pixels = np.asarray(img)
+            if pixels.dtype.byteorder == '>':
+                pixels = pixels.astype(pixels.dtype.newbyteorder('='))
+        except Exception as e:
+            logger.debug("Can't decode %s natively: %s", input_file_path, e)
+            return None
+
+    input_fname, _ = os.path.splitext(name)
+    output_file_path = os.path.join(output_path, input_fname + "_s0.png")
+    save_image(make_preview(
+        pixels, maxwh, pixels.ndim == 3,
+        getattr(settings, 'MTBF_CONTRAST_PERCENTILES', None)),
+        output_file_path, overwrite=True)
+    smeta['previewImage'] = output_file_path
+    return [smeta]
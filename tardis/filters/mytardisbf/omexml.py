@@ -0,0 +1,77 @@
+import xml.etree.ElementTree as et
+
+# Pixels and Channel attributes not extracted
+pix_exc = set(["id", "significantbits", "bigendian", "interleaved"])
+channel_exc = set(["color", "id", "color", "contrastmethod", "fluor",
+                   "ndfilter", "illuminationtype", "name",
+                   "pockelcellsetting", "acquisitionmode"])
+
+
+def get_image_meta(img_meta, ns):
+    """
+    Extract metadata of an OME-XML Image element
+
+    param img_meta: Image element
+    type img_meta: element
+
+    param ns: OME namespace
+    type ns: string
+
+    return: Dict of Image, Pixels and Channel attributes
+    rtype: dict
+    """
+    smeta = dict()
+    smeta['id'] = img_meta.attrib['ID']
+    smeta['name'] = img_meta.attrib.get('Name', '')
+    for pix_meta in img_meta.iterfind('{%s}Pixels' % ns):
+        for k, v in pix_meta.attrib.items():
+            if k.lower() not in pix_exc:
+                smeta[k.lower()] = v
+
+        for c, channel_meta in enumerate(
+                pix_meta.iterfind('{%s}Channel' % ns)):
+            for kc, vc in channel_meta.attrib.items():
+                if kc.lower() in channel_exc:
+                    continue
+                if kc.lower() not in smeta:
+                    smeta[kc.lower()] = ["Channel %s: %s" % (c, vc)]
+                else:
+                    smeta[kc.lower()].append("Channel %s: %s" % (c, vc))
+    return smeta
+
+
+def iter_series_meta(source):
+    """
+    Parse OME-XML incrementally, yielding the metadata of each Image in
+    document order. Elements are discarded once processed, so memory
+    does not grow with the number of series.
+
+    param source: Path or binary file object of OME-XML
+    type source: string
+
+    return: Iterator of dicts as returned by get_image_meta
+    rtype: iterator
+    """
+    root = ns = None
+    depth = 0
+    parent = None
+    for event, elem in et.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = elem
+                ns = elem.tag[1:].split('}', 1)[0]
+            elif depth == 2:
+                parent = elem
+            continue
+
+        depth -= 1
+        if depth == 1:
+            if elem.tag == '{%s}Image' % ns:
+                yield get_image_meta(elem, ns)
+            root.remove(elem)
+            parent = None
+        elif depth == 2 and parent is not None and \
+                parent.tag != '{%s}Image' % ns:
+            # e.g. original metadata annotations
+            parent.remove(elem)
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Bio-Formats FormatTools pixel types, BIT planes are read as bytes
+PIXEL_TYPES = {
+    0: 'i1',  # INT8
+    1: 'u1',  # UINT8
+    2: 'i2',  # INT16
+    3: 'u2',  # UINT16
+    4: 'i4',  # INT32
+    5: 'u4',  # UINT32
+    6: 'f4',  # FLOAT
+    7: 'f8',  # DOUBLE
+    8: 'u1',  # BIT
+}
+
+
+def get_dtype(pixel_type, little_endian):
+    """
+    Return numpy dtype of Bio-Formats pixel type and byte order
+
+    param pixel_type: FormatTools pixel type
+    type pixel_type: int
+
+    param little_endian: Whether pixels are little-endian
+    type little_endian: bool
+
+    rtype: numpy.dtype
+    """
+    return np.dtype(PIXEL_TYPES[pixel_type]).newbyteorder(
+        '<' if little_endian else '>')
+
+
+def get_plane_view(data, dtype, width, height, samples=1, interleaved=True,
+                   c=None):
+    """
+    Return a view of plane bytes as an array, without copying
+
+    param data: Plane bytes, may be longer than the plane
+    type data: numpy.ndarray (dtype = np.uint8)
+
+    param dtype: Pixel data type, including byte order
+    type dtype: numpy.dtype
+
+    param samples: RGB samples per pixel
+    type samples: int
+
+    param interleaved: Whether RGB samples are interleaved
+    type interleaved: bool
+
+    param c: RGB sample to view, all if not given
+    type c: int
+
+    return: H x W or H x W x samples array
+    rtype: numpy.ndarray
+    """
+    n = width * height * samples
+    img = data[:n * dtype.itemsize].view(dtype)
+    if samples == 1:
+        return img.reshape(height, width)
+    if interleaved:
+        img = img.reshape(height, width, samples)
+    else:
+        img = img.reshape(samples, height, width).transpose(1, 2, 0)
+    if c is not None:
+        return img[:, :, c]
+    return img
@@ -0,0 +1,146 @@
+import os
+import logging
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+from .contrast import stretch_contrast
+from .resample import thumbnail
+
+logger = logging.getLogger(__name__)
+
+SERIES_POLICIES = ('first', 'all', 'first_n', 'sample')
+
+
+def save_image(img, output_path, overwrite=False):
+    """
+    Save a preview image as PNG. The file is written to a temp file
+    in the output directory and renamed into place, so readers never
+    see a partial preview. Does not use the JVM.
+
+    param img: N x M array of grayscale pixel intensities, or N x M x C
+        array of RGB(A) pixels. Other than 8-bit images are stretched.
+    type img: ndarray
+
+    param output_path: Path to which the output file is to be saved.
+    type output_path: string
+
+    param overwrite: Specifies whether or not to overwrite an existing file if
+        a file already exist at the output path.
+    type overwrite: bool
+
+    raises Exception: if the file exists and overwrite is False
+    """
+    if not overwrite and os.path.exists(output_path):
+        raise Exception("Ouput file %s already exists and parameter"
+                        "overwrite=False" % output_path)
+
+    if img.dtype != np.uint8:
+        img = stretch_contrast(img)
+    mode = {2: 'L', 3: 'RGB', 4: 'RGBA'}[
+        img.shape[2] if img.ndim == 3 else 2]
+    image = Image.fromarray(np.ascontiguousarray(img), mode)
+
+    with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(output_path) or '.', suffix='.png',
+            delete=False) as f:
+        try:
+            image.save(f, 'PNG')
+        except Exception:
+            f.close()
+            os.remove(f.name)
+            raise
+    # NamedTemporaryFile creates 0600 files
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, output_path)
+
+
+def make_preview(img, maxwh=256, rgb=False, percentiles=None):
+    """
+    Make a preview of a plane, contrast stretching grayscale planes and
+    resizing to fit maxwh. Does not use the JVM and mostly runs with the
+    GIL released, so it can be run on worker threads.
+
+    param img: N x M grayscale or N x M x C RGB plane
+    type img: numpy.ndarray
+
+    param maxwh: Maximum width or height of the preview
+    type maxwh: int
+
+    param rgb: Whether the plane is RGB
+    type rgb: bool
+
+    param percentiles: Contrast stretch percentiles, see stretch_contrast
+    type percentiles: tuple
+
+    return: Preview image
+    rtype: numpy.ndarray
+    """
+    if not rgb:
+        img = stretch_contrast(img, percentiles)
+    return thumbnail(img, maxwh)
+
+
+def write_preview(img, output_path, maxwh=256, rgb=False, percentiles=None):
+    """
+    Make a preview of a plane and save it to output_path
+    """
+    save_image(make_preview(img, maxwh, rgb, percentiles), output_path,
+               overwrite=True)
+
+
+@lru_cache(maxsize=None)
+def get_preview_policy(policy):
+    """
+    Return preview series policy of the MTBF_PREVIEW_SERIES setting, or
+    'first' with an error logged once if it isn't valid, so that previews
+    are still made instead of failing every file
+
+    param policy: Setting value
+    type policy: string
+
+    return: One of SERIES_POLICIES
+    rtype: string
+    """
+    if policy and policy not in SERIES_POLICIES:
+        logger.error("Unknown MTBF_PREVIEW_SERIES %r, previews are made "
+                     "of the first series", policy)
+        return 'first'
+    return policy or 'first'
+
+
+def get_preview_series(count, policy='first', n=1):
+    """
+    Return indices of the series previews are made of
+
+    param count: Number of series
+    type count: int
+
+    param policy: 'first', 'all', 'first_n' for the first n series or
+        'sample' for n series evenly spread over the file
+    type policy: string
+
+    param n: Number of series for first_n and sample
+    type n: int
+
+    return: Sorted series indices
+    rtype: list
+    """
+    if count <= 0:
+        return []
+    if policy == 'all':
+        return list(range(count))
+    if policy == 'first_n':
+        return list(range(min(max(1, n), count)))
+    if policy == 'sample':
+        if n >= count:
+            return list(range(count))
+        if n <= 1:
+            return [0]
+        return sorted(set(int(round(i * (count - 1.0) / (n - 1)))
+                          for i in range(n)))
+    if policy != 'first':
+        raise ValueError("Unknown preview series policy %s" % policy)
+    return [0]
@@ -0,0 +1,97 @@
+import logging
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROJECTIONS = ('max', 'mean')
+
+
+@lru_cache(maxsize=None)
+def get_projection_mode(mode):
+    """
+    Return projection mode of the MTBF_PREVIEW_PROJECTION setting, or
+    None with an error logged once if it isn't valid, so that previews
+    fall back to the first plane instead of failing every file
+
+    param mode: Setting value
+    type mode: string
+
+    return: 'max', 'mean' or None
+    rtype: string
+    """
+    if mode and mode not in PROJECTIONS:
+        logger.error("Unknown MTBF_PREVIEW_PROJECTION %r, previews are "
+                     "made of the first plane", mode)
+        return None
+    return mode or None
+
+
+def get_projection_planes(size_z, size_t=1, max_planes=None, over_t=False):
+    """
+    Return (z, t) indices of the planes a projection is made of, evenly
+    sampled when there are more than max_planes
+
+    param size_z: Number of Z planes
+    type size_z: int
+
+    param size_t: Number of timepoints
+    type size_t: int
+
+    param max_planes: Max planes sampled, unbounded if not given
+    type max_planes: int
+
+    param over_t: Project over timepoints too, otherwise only t=0 is used
+    type over_t: bool
+
+    return: List of (z, t)
+    rtype: list
+    """
+    planes = [(z, t) for t in range(max(1, size_t) if over_t else 1)
+              for z in range(max(1, size_z))]
+    if max_planes and len(planes) > max_planes:
+        step = float(len(planes)) / max_planes
+        planes = [planes[int(i * step)] for i in range(max_planes)]
+    return planes
+
+
+def project(planes, mode='max'):
+    """
+    Max or mean intensity projection of planes, consumed one at a time
+    so that only the running result and one plane are held in memory
+
+    param planes: Iterable of equally shaped arrays
+    type planes: iterable
+
+    param mode: 'max' or 'mean'
+    type mode: string
+
+    return: Projection in the data type of the planes
+    rtype: numpy.ndarray
+    """
+    if mode not in PROJECTIONS:
+        raise ValueError("Unknown projection %s" % mode)
+    out = None
+    n = 0
+    dtype = None
+    for plane in planes:
+        n += 1
+        if out is None:
+            dtype = plane.dtype
+            if mode == 'max':
+                out = plane.copy()
+            else:
+                out = plane.astype(np.float32)
+        elif mode == 'max':
+            np.maximum(out, plane, out=out)
+        else:
+            out += plane
+    if out is None:
+        raise ValueError("No planes to project")
+    if mode == 'mean':
+        out /= n
+        if np.issubdtype(dtype, np.integer):
+            np.rint(out, out=out)
+        out = out.astype(dtype)
+    return out
@@ -0,0 +1,305 @@
+import os
+import logging
+import tempfile
+
+import numpy as np
+import javabridge
+import bioformats
+
+from .omexml import iter_series_meta
+from .resample import block_mean
+from .pixels import get_dtype, get_plane_view
+
+logger = logging.getLogger(__name__)
+
+# Same as bioformats.get_omexml_metadata, but keeps the reader open and
+# serializes the XML DOM straight to a file for streaming, without the
+# whole document as a Java String. setGroupFiles(false) is needed
+# for correct metadata. Pyramid levels are kept within their series for
+# resolution-aware preview reads. Returns the metadata store.
+OMEXML_SCRIPT = """
+importClass(Packages.loci.common.services.ServiceFactory,
+            Packages.loci.formats.services.OMEXMLService,
+            Packages.loci.formats['in'].DefaultMetadataOptions,
+            Packages.loci.formats['in'].MetadataLevel);
+reader.setGroupFiles(false);
+reader.setOriginalMetadataPopulated(true);
+reader.setFlattenedResolutions(false);
+var service = new ServiceFactory().getInstance(OMEXMLService);
+var metadata = service.createOMEXMLMetadata();
+reader.setMetadataStore(metadata);
+reader.setMetadataOptions(new DefaultMetadataOptions(MetadataLevel.ALL));
+reader.setId(path);
+var doc = javax.xml.parsers.DocumentBuilderFactory.newInstance()
+    .newDocumentBuilder().newDocument();
+var root = metadata.getRoot().asXMLElement(doc);
+root.setAttribute("xmlns", "http://www.openmicroscopy.org/Schemas/OME/" +
+    service.getLatestVersion());
+doc.appendChild(root);
+var transformer = javax.xml.transform.TransformerFactory.newInstance()
+    .newTransformer();
+transformer.setOutputProperty(javax.xml.transform.OutputKeys.ENCODING,
+                              "UTF-8");
+var stream = new java.io.FileOutputStream(xmlPath);
+try {
+    transformer.transform(new javax.xml.transform.dom.DOMSource(doc),
+                          new javax.xml.transform.stream.StreamResult(stream));
+} finally {
+    stream.close();
+}
+metadata;
+"""
+
+
+class PlaneTooLarge(Exception):
+    """Raised when no resolution level of a plane fits the read limit"""
+
+
+def get_max_heap():
+    """Return max heap of the JVM in bytes"""
+    runtime = javabridge.static_call(
+        "java/lang/Runtime", "getRuntime", "()Ljava/lang/Runtime;")
+    return javabridge.call(runtime, "maxMemory", "()J")
+
+
+class BioformatsReader(object):
+    """
+    Bio-Formats reader and OME-XML metadata of one file, opened once and
+    shared by all series of the file. Must be used on a thread attached
+    to the JVM.
+    """
+
+    def __init__(self, path, memo_dir=None, memo_min_elapsed=100):
+        """
+        param path: Path to image file
+        type path: string
+
+        param memo_dir: Directory for a Bio-Formats Memoizer file, which
+            holds the initialised reader state for faster reopening
+        type memo_dir: string
+
+        param memo_min_elapsed: Memo files are only written for files
+            taking longer than this many milliseconds to initialise
+        type memo_min_elapsed: int
+
+        raises javabridge.jutil.JavaException: if the file can't be read
+        """
+        self.path = path
+        self.buffer = None
+        self.buffer_size = 0
+        fd, self.xml_path = tempfile.mkstemp(suffix='.ome.xml')
+        os.close(fd)
+        self.rdr = bioformats.ImageReader(path=path, perform_init=False)
+        try:
+            if memo_dir is not None:
+                self.rdr.rdr.o = javabridge.make_instance(
+                    "loci/formats/Memoizer",
+                    "(Lloci/formats/IFormatReader;JLjava/io/File;)V",
+                    self.rdr.rdr.o, memo_min_elapsed,
+                    javabridge.make_instance(
+                        "java/io/File", "(Ljava/lang/String;)V", memo_dir))
+            self.metadata = javabridge.run_script(
+                OMEXML_SCRIPT, dict(path=self.rdr.path, reader=self.rdr.rdr,
+                                    xmlPath=self.xml_path))
+        except Exception:
+            self.close()
+            raise
+
+    def iter_series_meta(self):
+        """
+        Iterate over metadata dicts of all series, parsed incrementally
+        """
+        return iter_series_meta(self.xml_path)
+
+    def get_series_count(self):
+        return javabridge.call(self.metadata, "getImageCount", "()I")
+
+    def get_channel_count(self, series):
+        """Return number of OME-XML Channels of a series"""
+        return javabridge.call(self.metadata, "getChannelCount", "(I)I",
+                               series)
+
+    def get_size_c(self, series):
+        """Return OME-XML Pixels SizeC of a series"""
+        size_c = javabridge.call(
+            self.metadata, "getPixelsSizeC",
+            "(I)Lome/xml/model/primitives/PositiveInteger;", series)
+        return javabridge.call(
+            javabridge.call(size_c, "getValue", "()Ljava/lang/Integer;"),
+            "intValue", "()I")
+
+    def read_plane(self, c=None, z=0, t=0, XYWH=None):
+        """
+        Read a plane, or a region of it, of the current series and
+        resolution into a Java byte array reused across reads of the same
+        size, e.g. the tiles of a plane or planes of a stack. Pixels
+        are copied once into numpy and viewed in their native data type
+        and byte order.
+
+        param c: Channel, all samples of RGB images when None
+        type c: int
+
+        param XYWH: Region to read, the whole plane if not given
+        type XYWH: tuple
+
+        return: H x W or H x W x samples array, a view over the copied
+            bytes in the file byte order
+        rtype: numpy.ndarray
+        """
+        jrdr = self.rdr.rdr
+        samples = jrdr.getRGBChannelCount()
+        if c is None and samples == 1 and jrdr.getSizeC() > 1:
+            # Separate channel planes stacked by python-bioformats
+            return self.rdr.read(z=z, t=t, rescale=False, XYWH=XYWH)
+
+        x, y, w, h = XYWH or ((0, 0) + self.get_size())
+        nbytes = w * h * self.get_bytes_per_pixel()
+        # The whole array is copied out, so it must fit the read exactly
+        if self.buffer is None or self.buffer_size != nbytes:
+            self.buffer = None
+            self.buffer = javabridge.get_env().make_byte_array(
+                np.empty(nbytes, dtype=np.uint8))
+            self.buffer_size = nbytes
+
+        index = jrdr.getIndex(z, 0 if samples > 1 else (c or 0), t)
+        javabridge.call(jrdr.o, "openBytes", "(I[BIIII)[B", index,
+                        self.buffer, x, y, w, h)
+        data = javabridge.get_env().get_byte_array_elements(self.buffer)
+        return get_plane_view(
+            data, get_dtype(jrdr.getPixelType(), jrdr.isLittleEndian()),
+            w, h, samples, jrdr.isInterleaved(),
+            c if samples > 1 else None)
+
+    def set_series(self, series, resolution=0):
+        """
+        Select series and pyramid resolution level, 0 is full resolution
+        """
+        self.rdr.rdr.setSeries(series)
+        if resolution:
+            javabridge.call(self.rdr.rdr.o, "setResolution", "(I)V",
+                            resolution)
+
+    def get_resolution_count(self):
+        """Return number of pyramid levels of the current series"""
+        return javabridge.call(self.rdr.rdr.o, "getResolutionCount", "()I")
+
+    def get_size_zt(self, series):
+        """Return Z and T size of a series"""
+        self.set_series(series)
+        return self.rdr.rdr.getSizeZ(), self.rdr.rdr.getSizeT()
+
+    def get_size(self):
+        """Return X and Y size of the current series and resolution"""
+        return self.rdr.rdr.getSizeX(), self.rdr.rdr.getSizeY()
+
+    def get_bytes_per_pixel(self):
+        """Return bytes per pixel of all channels read at once"""
+        bpp = javabridge.static_call(
+            "loci/formats/FormatTools", "getBytesPerPixel", "(I)I",
+            self.rdr.rdr.getPixelType())
+        return bpp * self.rdr.rdr.getRGBChannelCount()
+
+    def get_plane_bytes(self):
+        """Return bytes of a plane of the current series and resolution"""
+        sizex, sizey = self.get_size()
+        return sizex * sizey * self.get_bytes_per_pixel()
+
+    def select_resolution(self, series, maxwh, max_plane_bytes=None):
+        """
+        Select the lowest resolution level of a series that still covers
+        a maxwh preview of the full resolution image. Lower levels are
+        selected if its planes are larger than max_plane_bytes.
+
+        return: Reduction factor from full resolution
+        rtype: float
+
+        raises PlaneTooLarge: if planes of all levels are too large
+        """
+        self.set_series(series)
+        sizex, sizey = self.get_size()
+        f = min(1.0, float(maxwh) / sizex, float(maxwh) / sizey)
+        tw, th = int(sizex * f), int(sizey * f)
+        count = self.get_resolution_count()
+        resolution = 0
+        for level in range(1, count):
+            self.set_series(series, level)
+            lx, ly = self.get_size()
+            if lx < tw or ly < th:
+                break
+            resolution = level
+        self.set_series(series, resolution)
+        if max_plane_bytes:
+            while self.get_plane_bytes() > max_plane_bytes:
+                resolution += 1
+                if resolution >= count:
+                    raise PlaneTooLarge(
+                        "Planes of series %s of %s are larger than %s bytes"
+                        % (series, self.path, max_plane_bytes))
+                self.set_series(series, resolution)
+        return float(self.get_size()[0]) / sizex
+
+    def read_preview(self, series, maxwh, c=None, z=0, t=0, max_bytes=None,
+                     max_plane_bytes=None):
+        """
+        Read a plane reduced to no less than maxwh in either dimension.
+        Reads the lowest covering pyramid level when the format has one.
+        Planes larger than max_bytes are read in tiles, each reduced by
+        block averaging as it is read, so memory is bounded by tile size.
+
+        param series: Series index
+        type series: int
+
+        param maxwh: Preview size the plane should still cover
+        type maxwh: int
+
+        param max_bytes: Max bytes read at once, default unbounded
+        type max_bytes: int
+
+        param max_plane_bytes: Max bytes of a plane at the level read,
+            lower levels are read for larger planes
+        type max_plane_bytes: int
+
+        return: Reduced plane in its native data type
+        rtype: numpy.ndarray
+
+        raises PlaneTooLarge: if no level has planes within max_plane_bytes
+        """
+        self.select_resolution(series, maxwh, max_plane_bytes)
+        sizex, sizey = self.get_size()
+        k = max(1, int(min(float(sizex) / maxwh, float(sizey) / maxwh)))
+        bpp = self.get_bytes_per_pixel()
+
+        if max_bytes is None or sizex * sizey * bpp <= max_bytes:
+            return block_mean(self.read_plane(c, z, t), k)
+
+        # Tiles are multiples of k so blocks never span tiles
+        width, height = sizex // k * k, sizey // k * k
+        tile_w = min(width, max(k, max_bytes // (k * bpp) // k * k))
+        tile_h = min(height, max(k, max_bytes // (tile_w * bpp) // k * k))
+        logger.debug("Reading %sx%s plane in %sx%s tiles reduced by %s",
+                     sizex, sizey, tile_w, tile_h, k)
+
+        out = None
+        for y in range(0, height, tile_h):
+            h = min(tile_h, height - y)
+            for x in range(0, width, tile_w):
+                w = min(tile_w, width - x)
+                tile = block_mean(
+                    self.read_plane(c, z, t, (x, y, w, h)), k)
+                if out is None:
+                    shape = (height // k, width // k) + tile.shape[2:]
+                    out = np.empty(shape, dtype=tile.dtype)
+                out[y // k:(y + h) // k, x // k:(x + w) // k] = tile
+        return out
+
+    def close(self):
+        self.buffer = None
+        self.rdr.close()
+        if os.path.exists(self.xml_path):
+            os.remove(self.xml_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
@@ -0,0 +1,88 @@
+import numpy as np
+
+
+def block_mean(img, k):
+    """
+    Reduce an image by an integer factor, averaging k x k blocks. Rows
+    and columns left over at the bottom and right edges are dropped.
+
+    param img: N x M or N x M x C array
+    type img: numpy.ndarray
+
+    param k: Reduction factor
+    type k: int
+
+    return: N/k x M/k (x C) array in the input data type, native byte order
+    rtype: numpy.ndarray
+    """
+    dtype = img.dtype.newbyteorder('=')
+    if k <= 1:
+        return img if img.dtype.isnative else img.astype(dtype)
+    h, w = img.shape[0] // k, img.shape[1] // k
+    blocks = img[:h * k, :w * k].reshape((h, k, w, k) + img.shape[2:])
+    out = blocks.mean(axis=(1, 3), dtype=np.float32)
+    if np.issubdtype(img.dtype, np.integer):
+        np.rint(out, out=out)
+    return out.astype(dtype)
+
+
+def get_zoom_factor(img, maxwh, upscale=False):
+    """
+    Return factor resizing an image to fit maxwh, images already fitting
+    are only enlarged to fill maxwh with upscale
+    """
+    sizey, sizex = img.shape[:2]
+    f = min(float(maxwh) / sizex, float(maxwh) / sizey)
+    return f if upscale else min(1.0, f)
+
+
+def resize_axis(img, size, axis):
+    """
+    Linearly interpolate an image to size along axis, sampling at pixel
+    centres. Returns float32.
+    """
+    n = img.shape[axis]
+    pos = (np.arange(size, dtype=np.float32) + 0.5) * (float(n) / size) - 0.5
+    np.clip(pos, 0, n - 1, out=pos)
+    i0 = pos.astype(np.intp)
+    i1 = np.minimum(i0 + 1, n - 1)
+    shape = [1] * img.ndim
+    shape[axis] = size
+    w = (pos - i0).reshape(shape)
+    a = np.take(img, i0, axis=axis).astype(np.float32)
+    a *= 1 - w
+    a += np.take(img, i1, axis=axis) * w
+    return a
+
+
+def thumbnail(img, maxwh, upscale=False):
+    """
+    Resize an image to fit maxwh, by averaging integer blocks first and
+    interpolating the remaining fraction
+
+    param img: N x M or N x M x C array
+    type img: numpy.ndarray
+
+    param maxwh: Max width and height of the result
+    type maxwh: int
+
+    param upscale: Enlarge images smaller than maxwh
+    type upscale: bool
+
+    return: Resized array in the input data type
+    rtype: numpy.ndarray
+    """
+    f = get_zoom_factor(img, maxwh, upscale)
+    if f == 1.0:
+        return img
+    sizey, sizex = img.shape[:2]
+    th = max(1, int(round(sizey * f)))
+    tw = max(1, int(round(sizex * f)))
+
+    img = block_mean(img, max(1, min(sizey // th, sizex // tw)))
+    if img.shape[:2] == (th, tw):
+        return img
+    out = resize_axis(resize_axis(img, th, 0), tw, 1)
+    if np.issubdtype(img.dtype, np.integer):
+        np.rint(out, out=out)
+    return out.astype(img.dtype)
@@ -3,6 +3,7 @@ import traceback
 import logging
 
 from ..helpers import fileFilter, get_thumbnail_paths, fileoutput
+from ..metrics import timer
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +31,7 @@ class PdfImageFilter(fileFilter):
         return Extracted metadata
         rtype dict
         """
-        if not filename.lower().endswith('.pdf'):
+        if not self.accepts(filename):
             return None
 
         logger.info("Applying PDF filter to {}...".format(filename))
@@ -42,9 +43,10 @@ class PdfImageFilter(fileFilter):
             if not os.path.exists(os.path.dirname(thumb_abs_path)):
                 os.makedirs(os.path.dirname(thumb_abs_path))
 
-            fileoutput('/usr/bin', 'convert',
-                       [filename + '[0]',  # first page of PDF file
-                        thumb_abs_path])
+            with timer(self.name, 'thumbnail'):
+                fileoutput('/usr/bin', 'convert',
+                           [filename + '[0]',  # first page of PDF file
+                            thumb_abs_path])
 
             if os.path.exists(thumb_abs_path):
                 return self.filter_metadata({
@@ -0,0 +1,256 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+
+from django.conf import settings
+
+from tardis import __version__
+from .helpers import get_thumbnail_paths
+from .lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+result_cache = None  # Global result cache, see get_result_cache
+
+
+class ResultCache(LRUCache):
+    """
+    Content-addressed cache of filter results. Entries are keyed by
+    file content hash, filter config and package version, and hold the
+    extracted metadata and a copy of the preview image. Least recently
+    used entries are evicted once the cache grows over max_size bytes.
+    """
+
+    def __init__(self, path, max_size, max_file_size):
+        """
+        param path: Cache directory
+        type path: string
+
+        param max_size: Max total size of cache entries in bytes
+        type max_size: int
+
+        param max_file_size: Files larger than this are not hashed
+        type max_file_size: int
+        """
+        super().__init__(path, max_size)
+        self.max_file_size = max_file_size
+
+    def get_key(self, filter, filename):
+        """
+        Return cache key for filter and file, or None if file is not
+        cacheable
+
+        param filter: POST_SAVE_FILTERS entry
+        type filter: tuple
+
+        param filename: Absolute path to a file
+        type filename: string
+
+        return Hex digest
+        rtype string
+        """
+        if os.path.getsize(filename) > self.max_file_size:
+            return None
+        h = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(block)
+        h.update(json.dumps([__version__, filter]).encode('utf-8'))
+        return h.hexdigest()
+
+    def get_entry_path(self, key, ext='json'):
+        return os.path.join(self.path, key[:2], '%s.%s' % (key, ext))
+
+    def get(self, key, id, filename, uri):
+        """
+        Return cached metadata, with the preview image copied to the
+        thumbnail location of the datafile
+
+        param key: Cache key
+        type key: string
+
+        param id: Datafile ID
+        type id: integer
+
+        param filename: Absolute path to a file for processing
+        type filename: string
+
+        param uri: Dataset URI
+        type uri: string
+
+        return Metadata or None if not cached
+        rtype dict
+        """
+        entry_path = self.get_entry_path(key)
+        try:
+            with open(entry_path) as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        metadata = entry['metadata']
+        name = entry.get('previewName')
+        if entry['previewImage'] is not None:
+            if name is None:
+                # Entry written before preview names were stored
+                return None
+            # Previews are named as the filter named them for this file,
+            # in the thumbnail directory of this datafile
+            thumb_dir = os.path.dirname(
+                get_thumbnail_paths(id, filename, uri)[0])
+            thumb_rel_path = os.path.join(
+                thumb_dir, format_preview_name(name, filename))
+            thumb_abs_path = os.path.join(settings.METADATA_STORE_PATH,
+                                          thumb_rel_path)
+            ext = entry['previewImage']
+            if not os.path.exists(os.path.dirname(thumb_abs_path)):
+                os.makedirs(os.path.dirname(thumb_abs_path))
+            try:
+                link_or_copy(self.get_entry_path(key, ext), thumb_abs_path)
+            except (IOError, OSError):
+                return None
+            if os.path.isabs(metadata['previewImage']):
+                metadata['previewImage'] = thumb_abs_path
+            else:
+                metadata['previewImage'] = thumb_rel_path
+
+        # Mark as recently used
+        os.utime(entry_path)
+
+        return metadata
+
+    def put(self, key, metadata, filename):
+        """
+        Store metadata and preview image in the cache
+
+        param key: Cache key
+        type key: string
+
+        param metadata: Extracted metadata
+        type metadata: dict
+
+        param filename: Absolute path to the processed file
+        type filename: string
+        """
+        ext = name = None
+        preview = metadata.get('previewImage')
+        if preview:
+            preview_path = os.path.join(settings.METADATA_STORE_PATH, preview)
+            if not os.path.exists(preview_path):
+                return
+            name = get_preview_name(preview_path, filename)
+            ext = os.path.splitext(preview_path)[1][1:]
+
+        entry_path = self.get_entry_path(key)
+        if not os.path.exists(os.path.dirname(entry_path)):
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        entry_size = 0
+        if ext is not None:
+            atomic_copy(preview_path, self.get_entry_path(key, ext))
+            entry_size += os.path.getsize(preview_path)
+        with tempfile.NamedTemporaryFile(
+                'w', dir=os.path.dirname(entry_path), delete=False) as f:
+            json.dump({'metadata': metadata, 'previewImage': ext,
+                       'previewName': name}, f)
+            entry_size += f.tell()
+        os.replace(f.name, entry_path)
+        self.add(entry_size)
+
+    def get_entries(self):
+        """
+        Return cache entries, each the files of a key, used as of the
+        mtime of its metadata
+
+        return Iterable of (mtime, size, (key, paths))
+        rtype iterable
+        """
+        entries = {}
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                key = name.split('.', 1)[0]
+                entry = entries.setdefault(key, [0, 0, []])
+                entry[1] += st.st_size
+                entry[2].append(path)
+                if name.endswith('.json'):
+                    entry[0] = st.st_mtime
+        return [(mtime, size, (key, paths))
+                for key, (mtime, size, paths) in entries.items()]
+
+    def remove_entry(self, entry):
+        key, paths = entry
+        logger.debug("Evicting cached result {}".format(key))
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def get_preview_name(preview_path, filename):
+    """
+    Return preview file name with the name of the processed file, with
+    or without extension, replaced by a placeholder
+
+    return [placeholder, rest of the name]
+    rtype list
+    """
+    name = os.path.basename(preview_path)
+    basename = os.path.basename(filename)
+    stem = os.path.splitext(basename)[0]
+    for placeholder, prefix in (('name', basename), ('stem', stem)):
+        if prefix and name.startswith(prefix):
+            return [placeholder, name[len(prefix):]]
+    return [None, name]
+
+
+def format_preview_name(name, filename):
+    """Return preview file name of the processed file"""
+    placeholder, rest = name
+    basename = os.path.basename(filename)
+    prefix = {
+        'name': basename,
+        'stem': os.path.splitext(basename)[0],
+    }.get(placeholder, '')
+    return prefix + rest
+
+
+def link_or_copy(src, dst):
+    """Hard link src to dst, falling back to a copy across filesystems"""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def atomic_copy(src, dst):
+    """Copy src to dst through a temp file in the dst directory"""
+    with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(dst), delete=False) as f:
+        with open(src, 'rb') as fsrc:
+            shutil.copyfileobj(fsrc, f)
+    os.replace(f.name, dst)
+
+
+def get_result_cache():
+    """
+    Return result cache configured in settings, or None if disabled
+    """
+    global result_cache
+    if not getattr(settings, 'RESULT_CACHE_ENABLED', False):
+        return None
+    if result_cache is None:
+        result_cache = ResultCache(
+            settings.RESULT_CACHE_PATH,
+            getattr(settings, 'RESULT_CACHE_MAX_SIZE', 1024 ** 3),
+            getattr(settings, 'RESULT_CACHE_MAX_FILE_SIZE', 1024 ** 3))
+    return result_cache
@@ -0,0 +1,156 @@
+"""
+Content sniffing of files before dispatch to filters.
+
+Filters are selected by extension, but many extensions are shared by
+unrelated formats. The first few KB of a file are checked against
+header validators of each matching filter, so that filters which can't
+succeed are not queued.
+"""
+import re
+import logging
+
+from django.conf import settings
+
+from .helpers import get_suffixes
+
+logger = logging.getLogger(__name__)
+
+# Control bytes that don't occur in text, all but tab, LF, FF and CR.
+# Bytes over 0x7f are otherwise not checked here, see is_utf8.
+CONTROL_RE = re.compile(rb'[\x00-\x08\x0b\x0e-\x1f\x7f]')
+
+# Signatures of text files which may have no line breaks
+MARKUP_RE = re.compile(rb'^(\xef\xbb\xbf)?\s*<(\?xml|!doctype|html)', re.I)
+
+FCS_RE = re.compile(rb'^FCS\d\.\d')
+
+# Extensions shared by many formats, only Bioformats files that are not
+# text are dispatched. Formats with text headers such as ICS or NRRD
+# have their own extensions.
+GENERIC_SUFFIXES = ('txt', 'xml', 'html', 'htm', 'dat', 'raw', 'img')
+
+
+def read_header(filename, size):
+    with open(filename, 'rb') as f:
+        return f.read(size)
+
+
+def has_control_bytes(header):
+    return CONTROL_RE.search(header) is not None
+
+
+def is_utf8(header):
+    try:
+        header.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # Header may end within a multibyte character
+        return e.reason == 'unexpected end of data'
+    return True
+
+
+def is_text(header):
+    """
+    Return whether a header is ASCII or UTF-8 text with line breaks or a
+    markup signature. Headerless pixel data can be valid text by chance,
+    but rarely with line structure too.
+    """
+    if has_control_bytes(header) or not is_utf8(header):
+        return False
+    return b'\n' in header or b'\r' in header or \
+        MARKUP_RE.match(header) is not None
+
+
+def is_smv(header):
+    return header.startswith(b'{') and b'HEADER_BYTES=' in header[:64]
+
+
+def is_raxis(header):
+    return header.startswith(b'R-AXIS') or header.startswith(b'RAXIS')
+
+
+def is_ome_xml(header):
+    return b'<OME' in header
+
+
+def is_fcs(header):
+    return FCS_RE.match(header) is not None
+
+
+def check_bioformats(filename, header):
+    if is_ome_xml(header):
+        return True
+    # Formats of other filters
+    if is_smv(header) or is_raxis(header) or is_fcs(header):
+        return False
+    suffixes = get_suffixes(filename)
+    if suffixes and suffixes[-1] in GENERIC_SUFFIXES:
+        return not is_text(header)
+    return True
+
+
+def check_fcs(filename, header):
+    return is_fcs(header)
+
+
+def check_pdf(filename, header):
+    # Some writers put junk before the signature
+    return b'%PDF-' in header[:1024]
+
+
+def check_xlsx(filename, header):
+    return header.startswith(b'PK\x03\x04')
+
+
+def check_csv(filename, header):
+    # Wide tables may have no line break in the header, and may be in
+    # other encodings than UTF-8
+    return not has_control_bytes(header)
+
+
+def check_diffraction(filename, header):
+    return is_smv(header) or is_raxis(header)
+
+
+# Header validators by filter name, filters without one are not checked
+VALIDATORS = {
+    'Bioformats': check_bioformats,
+    'FCS': check_fcs,
+    'PDF': check_pdf,
+    'XLSX': check_xlsx,
+    'CSV': check_csv,
+    'IMG': check_diffraction,
+}
+
+
+def sniff_filters(filename, filters):
+    """
+    Return the filters whose header validator accepts a file
+
+    param filename: Absolute path to a file
+    type filename: string
+
+    param filters: POST_SAVE_FILTERS entries matching the file name
+    type filters: list
+
+    return Filters that can plausibly process the file
+    rtype list
+    """
+    size = getattr(settings, 'FILTER_SNIFF_BYTES', 4096)
+    if not size or not any(f[1][0] in VALIDATORS for f in filters):
+        return filters
+    try:
+        header = read_header(filename, size)
+    except (IOError, OSError) as e:
+        # Leave errors to the filters
+        logger.debug("Can't sniff {}: {}".format(filename, str(e)))
+        return filters
+
+    accepted = []
+    for filter in filters:
+        validator = VALIDATORS.get(filter[1][0])
+        if validator is None or validator(filename, header):
+            accepted.append(filter)
+        else:
+            logger.info("Skip: filter={}, filename={}, content not "
+                        "recognised".format(filter[0][0], filename))
+    return accepted
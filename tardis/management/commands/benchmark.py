@@ -0,0 +1,34 @@
+import tempfile
+
+from django.core.management.base import BaseCommand
+
+from tardis.benchmarks import run_benchmarks, format_report, write_report
+
+
+class Command(BaseCommand):
+    help = "Benchmark filters on test assets and synthetic inputs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help="Size multiplier of synthetic inputs")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Number of timed runs per case")
+        parser.add_argument('--only',
+                            help="Run cases with this substring in name")
+        parser.add_argument('--json', dest='json_path',
+                            help="Write results as JSON to this path")
+        parser.add_argument('--workdir',
+                            help="Directory for inputs, default is a "
+                                 "temporary directory")
+
+    def handle(self, *args, **options):
+        if options['workdir']:
+            report = run_benchmarks(options['workdir'], options['scale'],
+                                    options['repeat'], options['only'])
+        else:
+            with tempfile.TemporaryDirectory() as workdir:
+                report = run_benchmarks(workdir, options['scale'],
+                                        options['repeat'], options['only'])
+        self.stdout.write(format_report(report))
+        if options['json_path']:
+            write_report(report, options['json_path'])
@@ -0,0 +1,140 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from tardis.celery import app
+
+logger = logging.getLogger(__name__)
+
+publisher = None  # Global publisher for this process, see get_publisher
+
+
+class MetadataPublisher(object):
+    """
+    Sends extracted metadata back to MyTardis. Within batch() and with
+    batch_size > 1 and a batch_task the portal provides, results are
+    buffered and sent as a single batch_task task once batch_size results
+    are waiting or interval seconds have passed since the first one.
+    Single save_metadata tasks are sent otherwise.
+    """
+
+    def __init__(self, batch_size=0, interval=5, batch_task=None):
+        """
+        param batch_size: Max number of results per batch, 0 disables
+        type batch_size: int
+
+        param interval: Max number of seconds a result is buffered for
+        type interval: float
+
+        param batch_task: Portal task saving a list of results, None
+            disables batching
+        type batch_task: string
+        """
+        self.batch_size = batch_size
+        self.interval = interval
+        self.batch_task = batch_task
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.timer = None
+        self.local = threading.local()
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffer results published by this thread within the block, all
+        of them are sent by the end of it
+        """
+        self.local.batching = True
+        try:
+            yield
+        finally:
+            self.local.batching = False
+            self.flush()
+
+    def publish(self, id, name, schema, metadata):
+        """
+        Queue metadata for a datafile
+
+        param id: Datafile ID
+        type id: integer
+
+        param name: Filter name
+        type name: string
+
+        param schema: Schema namespace
+        type schema: string
+
+        param metadata: Extracted metadata
+        type metadata: dict
+        """
+        item = [id, name, schema, metadata]
+        # Results outside batch() are sent before the task is acknowledged
+        if self.batch_size <= 1 or not self.batch_task or \
+                not getattr(self.local, 'batching', False):
+            self.send([item])
+            return
+
+        items = None
+        with self.lock:
+            self.buffer.append(item)
+            if len(self.buffer) >= self.batch_size:
+                items = self.take()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if items:
+            self.send(items)
+
+    def flush(self):
+        """
+        Send all buffered results
+        """
+        with self.lock:
+            items = self.take()
+        if items:
+            self.send(items)
+
+    def take(self):
+        # Must be called with lock held
+        items, self.buffer = self.buffer, []
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return items
+
+    def send(self, items):
+        # Reuse one pooled producer connection for all messages
+        with app.producer_or_acquire() as producer:
+            if len(items) > 1:
+                app.send_task(
+                    self.batch_task,
+                    args=[items],
+                    queue=settings.API_QUEUE,
+                    priority=settings.API_TASK_PRIORITY,
+                    producer=producer
+                )
+                return
+            for item in items:
+                app.send_task(
+                    'tardis_portal.datafile.save_metadata',
+                    args=item,
+                    queue=settings.API_QUEUE,
+                    priority=settings.API_TASK_PRIORITY,
+                    producer=producer
+                )
+
+
+def get_publisher():
+    """
+    Return metadata publisher for this process
+    """
+    global publisher
+    if publisher is None:
+        publisher = MetadataPublisher(
+            getattr(settings, 'API_BATCH_SIZE', 0),
+            getattr(settings, 'API_BATCH_INTERVAL', 5),
+            getattr(settings, 'API_BATCH_TASK', None))
+    return publisher
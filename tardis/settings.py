@@ -28,10 +28,32 @@ DEFAULT_TASK_PRIORITY = data['celery']['default_task_priority']
 
 API_QUEUE = data['api']['queue']
 API_TASK_PRIORITY = data['api']['task_priority']
+API_BATCH_SIZE = data['api'].get('batch_size', 0)
+API_BATCH_INTERVAL = data['api'].get('batch_interval', 5)
+# Batching is enabled only if the portal provides a batch task
+API_BATCH_TASK = data['api'].get('batch_task')
 
 CELERY_RESULT_BACKEND = data['celery']['result_backend']
 CELERY_ACKS_LATE = data['celery']['acks_late']
 
+# Max number of datafiles per run_filter_batch task
+FILTER_BATCH_SIZE = data['celery'].get('batch_size', 100)
+
+# Bytes read from the start of files to check their content before
+# dispatch, 0 dispatches by extension only
+FILTER_SNIFF_BYTES = data['celery'].get('sniff_bytes', 4096)
+
+# Filter lease locks
+locks = data.get('locks', {})
+FILTER_LOCK_TTL = locks.get('ttl', 300)
+FILTER_LOCK_TTL_PER_GB = locks.get('ttl_per_gb', 300)
+FILTER_LOCK_TTL_FACTORS = locks.get('ttl_factors') or {}
+FILTER_LOCK_HEARTBEAT = locks.get('heartbeat', 60)
+
+# Prometheus textfile export of filter metrics
+METRICS_PATH = data.get('metrics', {}).get('path')
+METRICS_INTERVAL = data.get('metrics', {}).get('interval', 15)
+
 CELERY_QUEUES = (
     Queue(
         CELERY_DEFAULT_QUEUE,
@@ -57,6 +79,33 @@ METADATA_STORE_PATH = data['metadata_store_path']
 
 POST_SAVE_FILTERS = data['post_save_filters']
 
+# Per-filter queue and priority, keyed by filter name
+FILTER_ROUTES = data.get('filter_routes') or {}
+
+filter_queues = []
+for filter in POST_SAVE_FILTERS:
+    route = FILTER_ROUTES.get(filter[1][0], {})
+    if route.get('queue') and route['queue'] not in filter_queues:
+        filter_queues.append(route['queue'])
+
+CELERY_QUEUES += tuple(
+    Queue(
+        queue,
+        Exchange(queue),
+        routing_key=queue,
+        queue_arguments={
+            'x-max-priority': MAX_TASK_PRIORITY
+        }
+    ) for queue in filter_queues if queue != CELERY_DEFAULT_QUEUE
+)
+
+# Content-addressed cache of filter results
+result_cache = data.get('result_cache', {})
+RESULT_CACHE_ENABLED = result_cache.get('enabled', False)
+RESULT_CACHE_PATH = result_cache.get('path', '/var/store/cache/results/')
+RESULT_CACHE_MAX_SIZE = result_cache.get('max_size', 1024 ** 3)
+RESULT_CACHE_MAX_FILE_SIZE = result_cache.get('max_file_size', 1024 ** 3)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -64,4 +113,50 @@ DATABASES = {
     }
 }
 
-MTBF_MAX_HEAP_SIZE = '1G'
+# JVM max heap, e.g. '1G', or 'auto' to share MTBF_HEAP_MEMORY_RATIO of
+# the container memory limit between the JVMs of MTBF_WORKER_CONCURRENCY
+# worker processes (CPU count if not set)
+bioformats = data.get('bioformats', {})
+MTBF_MAX_HEAP_SIZE = bioformats.get('max_heap_size', 'auto')
+MTBF_HEAP_MEMORY_RATIO = bioformats.get('heap_memory_ratio', 0.5)
+MTBF_WORKER_CONCURRENCY = bioformats.get('worker_concurrency')
+# Bio-Formats Memoizer files of readers taking longer than min_elapsed
+# milliseconds to initialise, kept up to max_size bytes. Disabled if no path.
+MTBF_MEMO_PATH = bioformats.get('memo_path')
+MTBF_MEMO_MAX_SIZE = bioformats.get('memo_max_size', 1024 ** 3)
+MTBF_MEMO_MIN_ELAPSED = bioformats.get('memo_min_elapsed', 100)
+# Extensions of simple 2D images read with Pillow instead of Bio-Formats
+MTBF_NATIVE_FORMATS = bioformats.get('native_formats') or []
+# Previews of planes larger than this are read from lower resolution
+# levels, or skipped if there are none. None for no limit, large planes
+# are then read in tiles.
+MTBF_MAX_PREVIEW_PLANE_BYTES = None
+# Planes larger than this are read for previews in reduced tiles
+MTBF_MAX_PLANE_BYTES = 64 * 1024 ** 2
+# Percentiles mapped to black and white in previews, e.g. (0.5, 99.5),
+# None for min and max
+MTBF_CONTRAST_PERCENTILES = None
+# Threads making and saving previews of series while planes are read,
+# 0 makes previews one at a time
+MTBF_PREVIEW_THREADS = 0
+# Series previews are made of: 'first', 'all', 'first_n' or 'sample' for
+# MTBF_PREVIEW_SERIES_COUNT series evenly spread over the file. Only the
+# first series is returned by the filter.
+MTBF_PREVIEW_SERIES = 'first'
+MTBF_PREVIEW_SERIES_COUNT = 1
+# Seconds after which no more series previews are made for a file,
+# None for no limit
+MTBF_PREVIEW_TIME_BUDGET = None
+# Preview Z stacks as 'max' or 'mean' intensity projection of at most
+# MTBF_PREVIEW_PROJECTION_MAX_PLANES planes, optionally over timepoints.
+# None previews the first plane.
+MTBF_PREVIEW_PROJECTION = None
+MTBF_PREVIEW_PROJECTION_MAX_PLANES = 16
+MTBF_PREVIEW_PROJECTION_OVER_T = False
+# Number of JVM worker processes per filter process, 0 runs in-process
+MTBF_JVM_POOL_SIZE = 1
+# Recycle JVM worker after this many files or heap usage ratio
+MTBF_JVM_MAX_FILES = 100
+MTBF_JVM_MAX_HEAP_RATIO = 0.8
+# Seconds after which a JVM worker is killed and replaced, None for no limit
+MTBF_JVM_TIMEOUT = 1800
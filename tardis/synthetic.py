@@ -0,0 +1,205 @@
+"""
+Writers of synthetic input files, used by tests and benchmarks
+"""
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+
+def write_ome_tiff(path, size, planes):
+    """
+    Write an uncompressed little-endian OME-TIFF Z stack of uint16 planes
+    """
+    ome = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<OME xmlns="http://www.openmicroscopy.org/Schemas/OME/2016-06">'
+        '<Image ID="Image:0" Name="{name}">'
+        '<Pixels ID="Pixels:0" DimensionOrder="XYZCT" Type="uint16" '
+        'SizeX="{size}" SizeY="{size}" SizeZ="{planes}" SizeC="1" '
+        'SizeT="1"><Channel ID="Channel:0:0" SamplesPerPixel="1"/>'
+        '<TiffData/></Pixels></Image></OME>').format(
+            name=os.path.basename(path), size=size,
+            planes=planes).encode('ascii') + b'\0'
+
+    rng = np.random.RandomState(0)
+    y, x = np.mgrid[0:size, 0:size]
+    base = ((x + y) * (4000.0 / (2 * size))).astype(np.uint16)
+
+    with open(path, 'wb') as f:
+        f.write(b'II*\0' + struct.pack('<I', 0))
+        prev_next = 4
+        for z in range(planes):
+            noise = rng.randint(0, 500, (size, size)).astype(np.uint16)
+            data = (base + noise + z * 100).astype('<u2').tobytes()
+            desc = ome if z == 0 else None
+
+            data_offset = f.tell()
+            f.write(data)
+            desc_offset = f.tell()
+            if desc is not None:
+                f.write(desc)
+            if f.tell() % 2:
+                f.write(b'\0')
+
+            entries = [
+                (256, 4, 1, size),
+                (257, 4, 1, size),
+                (258, 3, 1, 16),
+                (259, 3, 1, 1),
+                (262, 3, 1, 1),
+            ]
+            if desc is not None:
+                entries.append((270, 2, len(desc), desc_offset))
+            entries += [
+                (273, 4, 1, data_offset),
+                (277, 3, 1, 1),
+                (278, 4, 1, size),
+                (279, 4, 1, len(data)),
+            ]
+            ifd_offset = f.tell()
+            f.write(struct.pack('<H', len(entries)))
+            for tag, typ, count, value in entries:
+                if typ == 3:
+                    f.write(struct.pack('<HHIHH', tag, typ, count, value, 0))
+                else:
+                    f.write(struct.pack('<HHII', tag, typ, count, value))
+            f.write(struct.pack('<I', 0))
+            end = f.tell()
+            f.seek(prev_next)
+            f.write(struct.pack('<I', ifd_offset))
+            f.seek(end)
+            prev_next = ifd_offset + 2 + 12 * len(entries)
+
+
+def write_csv(path, rows, cols):
+    with open(path, 'w') as f:
+        f.write(','.join('column%d' % c for c in range(cols)) + '\n')
+        for r in range(rows):
+            f.write(','.join(str(r * cols + c) for c in range(cols)) + '\n')
+
+
+def write_xlsx(path, sheets, rows, cols):
+    """Write a minimal XLSX workbook with numeric cells"""
+    def col_name(c):
+        name = ''
+        c += 1
+        while c:
+            c, rem = divmod(c - 1, 26)
+            name = chr(65 + rem) + name
+        return name
+
+    ns = 'http://schemas.openxmlformats.org'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="%s/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/'
+            'vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '%s</Types>') % (ns, ''.join(
+                '<Override PartName="/xl/worksheets/sheet%d.xml" '
+                'ContentType="application/vnd.openxmlformats-'
+                'officedocument.spreadsheetml.worksheet+xml"/>' % (s + 1)
+                for s in range(sheets))))
+        z.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="%s/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="%s/officeDocument/2006/'
+            'relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>') % (ns, ns))
+        z.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<workbook xmlns="%s/spreadsheetml/2006/main" '
+            'xmlns:r="%s/officeDocument/2006/relationships"><sheets>%s'
+            '</sheets></workbook>') % (ns, ns, ''.join(
+                '<sheet name="Sheet%d" sheetId="%d" r:id="rId%d"/>' % (
+                    s + 1, s + 1, s + 1) for s in range(sheets))))
+        z.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="%s/package/2006/relationships">%s'
+            '</Relationships>') % (ns, ''.join(
+                '<Relationship Id="rId%d" Type="%s/officeDocument/2006/'
+                'relationships/worksheet" Target="worksheets/sheet%d.xml"/>'
+                % (s + 1, ns, s + 1) for s in range(sheets))))
+        for s in range(sheets):
+            data = ''.join(
+                '<row r="%d">%s</row>' % (r + 1, ''.join(
+                    '<c r="%s%d"><v>%d</v></c>' % (
+                        col_name(c), r + 1, r * cols + c)
+                    for c in range(cols)))
+                for r in range(rows))
+            z.writestr('xl/worksheets/sheet%d.xml' % (s + 1), (
+                '<?xml version="1.0" encoding="UTF-8"?>'
+                '<worksheet xmlns="%s/spreadsheetml/2006/main">'
+                '<sheetData>%s</sheetData></worksheet>') % (ns, data))
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF with one line of text per page"""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        ('<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            ' '.join('%d 0 R' % (4 + 2 * p) for p in range(pages)),
+            pages)).encode('ascii'),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    for p in range(pages):
+        stream = ('BT /F1 24 Tf 72 720 Td (Page %d) Tj ET' % (p + 1)).encode(
+            'ascii')
+        objects.append((
+            '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            '/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (
+                5 + 2 * p)).encode('ascii'))
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (
+            len(stream), stream))
+
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-1.4\n')
+        offsets = []
+        for i, obj in enumerate(objects):
+            offsets.append(f.tell())
+            f.write(b'%d 0 obj\n%s\nendobj\n' % (i + 1, obj))
+        xref = f.tell()
+        f.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b'%010d 00000 n \n' % offset)
+        f.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                % (len(objects) + 1, xref))
+
+
+def write_smv(path, size):
+    """Write an ADSC SMV diffraction image with a 512 byte header"""
+    header = (
+        '{\nHEADER_BYTES=  512;\nDIM=2;\nBYTE_ORDER=little_endian;\n'
+        'TYPE=unsigned_short;\nSIZE1=%d;\nSIZE2=%d;\nPIXEL_SIZE=0.102600;\n'
+        'BIN=2x2;\nADC=slow;\nDETECTOR_SN=457;\n'
+        'DATE=Sun Sep 26 15:15:16 2004;\nTIME=1.000000;\n'
+        'DISTANCE=200.000000;\nTWOTHETA=0.000000;\nPHI=0.000000;\n'
+        'OSC_START=0.000000;\nOSC_RANGE=1.000000;\nWAVELENGTH=0.953700;\n'
+        'BEAM_CENTER_X=157.500000;\nBEAM_CENTER_Y=157.500000;\n}') % (
+            size, size)
+    rng = np.random.RandomState(0)
+    with open(path, 'wb') as f:
+        f.write(header.ljust(512).encode('ascii'))
+        for _ in range(size):
+            f.write(rng.randint(0, 4000, size).astype('<u2').tobytes())
+
+
+def write_raxis(path, byte_order='>'):
+    """Write a Rigaku R-AXIS header of a 1024 x 1024 image"""
+    header = bytearray(2048)
+    header[0:10] = b'R-AXIS    '
+    header[256:268] = b'2021-05-04  '
+    struct.pack_into(byte_order + 'f', header, 292, 1.5418)
+    struct.pack_into(byte_order + 'f', header, 344, 120.0)
+    struct.pack_into(byte_order + 'ff', header, 524, 10.0, 11.5)
+    struct.pack_into(byte_order + 'fff', header, 536, 3.0, 500.5, 16.25)
+    struct.pack_into(byte_order + 'f', header, 556, 2.0)
+    struct.pack_into(byte_order + 'iiffii', header, 768,
+                     1024, 1024, 0.1, 0.1, 2048, 1024)
+    with open(path, 'wb') as f:
+        f.write(bytes(header))
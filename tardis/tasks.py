@@ -1,16 +1,71 @@
 import traceback
 import logging
 import os
+import time
 
 from django.conf import settings
+from celery.signals import worker_init, worker_process_init, \
+    worker_process_shutdown
 
 from tardis.celery import app
-from tardis.filters.helpers import safe_import, acquire_lock, \
-    release_lock
+from tardis.filters.helpers import get_filter, load_filters, \
+    get_filters, get_dispatch_index, get_lock_ttl, LeaseLock
+from tardis.filters.results import get_result_cache
+from tardis.filters.sniff import sniff_filters
+from tardis.filters.metrics import metrics, timer, export_metrics, \
+    remove_exited_metrics
+from tardis.publisher import get_publisher
 
 logger = logging.getLogger(__name__)
 
 
+@worker_init.connect
+def build_dispatch_index(**kwargs):
+    # Build once in the parent process, inherited by pool processes
+    get_dispatch_index()
+    remove_exited_metrics()
+
+
+@worker_process_init.connect
+def warm_filters(**kwargs):
+    # Construct filters in each pool process before the first task
+    load_filters()
+
+
+@worker_process_shutdown.connect
+def flush_publisher(**kwargs):
+    # Send any buffered metadata and final metrics before the pool
+    # process exits, its metrics file is removed by other processes later
+    get_publisher().flush()
+    export_metrics(force=True)
+
+
+def get_route(filter):
+    """
+    Return apply_async queue and priority options for a filter
+
+    param filter: POST_SAVE_FILTERS entry
+    type filter: tuple
+
+    return Options for apply_async
+    rtype dict
+    """
+    route = getattr(settings, 'FILTER_ROUTES', {}).get(filter[1][0], {})
+    options = {}
+    if route.get('queue'):
+        options['queue'] = route['queue']
+    if route.get('priority') is not None:
+        options['priority'] = route['priority']
+    return options
+
+
+def chunks(items, size):
+    """Split list into lists of at most size items"""
+    size = max(1, int(size))
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
 @app.task(name='mytardis.apply_filters')
 def apply_filters(id, verified, filename, uri):
     # Accept task
@@ -21,51 +76,155 @@ def apply_filters(id, verified, filename, uri):
         logger.warning(
             'Datafile (id={}) is not verified, skipping filters'.format(id))
     else:
-        # Create sub-task for each filter
-        for filter in getattr(settings, 'POST_SAVE_FILTERS', []):
-            _, extension = os.path.splitext(filename)
-            if extension[1:] in filter[0][1]:
-                logger.info("Apply: filter={}, id={}, filename={}".format(
-                    filter[0][0], id, filename))
-                # Run task asynchronously
-                run_filter.apply_async(args=[filter, id, filename, uri])
+        # Create sub-task for each filter that can process the content
+        for filter in sniff_filters(filename, get_filters(filename)):
+            logger.info("Apply: filter={}, id={}, filename={}".format(
+                filter[0][0], id, filename))
+            # Run task asynchronously
+            run_filter.apply_async(args=[filter, id, filename, uri],
+                                   kwargs={'queued': time.time()},
+                                   **get_route(filter))
 
 
-@app.task
-def run_filter(filter, id, filename, uri):
+@app.task(name='mytardis.apply_filters_batch')
+def apply_filters_batch(datafiles):
+    """
+    Bulk version of apply_filters. Datafiles are grouped by filter and
+    dispatched as run_filter_batch chunks of FILTER_BATCH_SIZE files.
+
+    param datafiles: List of (id, verified, filename, uri)
+    type datafiles: list
+    """
     # Accept task
-    logger.info("Run: filter={}, id={}, filename={}".format(
-        filter[0][0], id, filename))
+    logger.info("Applying filters for {} datafiles".format(len(datafiles)))
+
+    groups = {}
+    for id, verified, filename, uri in datafiles:
+        # Do not process unverified files
+        if not verified:
+            logger.warning(
+                'Datafile (id={}) is not verified, skipping filters'.format(
+                    id))
+            continue
+        for filter in sniff_filters(filename, get_filters(filename)):
+            groups.setdefault(filter[1][0], (filter, []))[1].append(
+                [id, filename, uri])
+
+    batch_size = getattr(settings, 'FILTER_BATCH_SIZE', 100)
+    for filter, items in groups.values():
+        for chunk in chunks(items, batch_size):
+            logger.info("Apply: filter={}, files={}".format(
+                filter[0][0], len(chunk)))
+            # Run task asynchronously
+            run_filter_batch.apply_async(args=[filter, chunk],
+                                         kwargs={'queued': time.time()},
+                                         **get_route(filter))
 
-    # Import filter
-    callable = safe_import(filter)
+
+def process_datafile(callable, filter, id, filename, uri):
+    """
+    Run filter callable on a single datafile under lock and send
+    extracted metadata back to MyTardis
+    """
+    name = filter[1][0]
 
     # Lock filter call
-    lock_id = "filter-{}-{}".format(filter[1][0].lower(), id)
-    if acquire_lock(lock_id, 300):  # 5 mins lock
+    lock = LeaseLock(
+        "filter-{}-{}".format(name.lower(), id),
+        get_lock_ttl(name, filename),
+        getattr(settings, 'FILTER_LOCK_HEARTBEAT', None))
+    with timer(name, 'lock'):
+        locked = lock.acquire()
+    if locked:
+        start = time.time()
+        result = 'failure'
         try:
-            # Run filter
-            metadata = callable(id, filename, uri)
+            # Look up results for identical content
+            result_cache = get_result_cache()
+            key = metadata = None
+            if result_cache is not None:
+                key = result_cache.get_key(filter, filename)
+                if key is not None:
+                    metadata = result_cache.get(key, id, filename, uri)
+            if metadata is not None:
+                logger.info("Cached: filter={}, id={}, filename={}".format(
+                    filter[0][0], id, filename))
+                result = 'cached'
+            else:
+                # Run filter
+                metadata = callable(id, filename, uri)
+                if metadata is not None and key is not None:
+                    result_cache.put(key, metadata, filename)
+                result = 'success'
             if metadata is None:
                 # Something gone wrong
                 s = "Can't get metadata for filter={}, id={}, filename={}"
                 logger.error(s.format(filter[0][0], id, filename))
+                result = 'none'
             else:
                 # Send metadata back to mothership
-                app.send_task(
-                    'tardis_portal.datafile.save_metadata',
-                    args=[
+                with timer(name, 'publish'):
+                    get_publisher().publish(
                         id,
-                        filter[1][0],  # name
+                        name,
                         filter[1][1],  # schema
                         metadata
-                    ],
-                    queue=settings.API_QUEUE,
-                    priority=settings.API_TASK_PRIORITY
-                )
+                    )
+                metrics.inc('bytes_total', name, os.path.getsize(filename))
         except Exception as e:
             logger.error(str(e))
             logger.debug(traceback.format_exc())
         finally:
             # Unlock
-            release_lock(lock_id)
+            lock.release()
+            metrics.observe(name, 'run', time.time() - start)
+            metrics.inc('results_total', name, result=result)
+            export_metrics()
+
+
+def observe_queue_wait(filter, queued):
+    if queued is not None:
+        metrics.observe(filter[1][0], 'queue', max(0, time.time() - queued))
+
+
+@app.task
+def run_filter(filter, id, filename, uri, queued=None):
+    # Accept task
+    logger.info("Run: filter={}, id={}, filename={}".format(
+        filter[0][0], id, filename))
+    observe_queue_wait(filter, queued)
+
+    # Get filter from registry
+    callable = get_filter(filter)
+
+    process_datafile(callable, filter, id, filename, uri)
+
+
+@app.task
+def run_filter_batch(filter, datafiles, queued=None):
+    """
+    Run a filter over a chunk of datafiles
+
+    param filter: POST_SAVE_FILTERS entry
+    type filter: tuple
+
+    param datafiles: List of (id, filename, uri)
+    type datafiles: list
+
+    param queued: Time the chunk was queued at
+    type queued: float
+    """
+    # Accept task
+    logger.info("Run batch: filter={}, files={}".format(
+        filter[0][0], len(datafiles)))
+    observe_queue_wait(filter, queued)
+
+    # Get filter from registry
+    callable = get_filter(filter)
+
+    # Buffered metadata is sent before the chunk is acknowledged
+    with get_publisher().batch():
+        for id, filename, uri in datafiles:
+            logger.info("Run: filter={}, id={}, filename={}".format(
+                filter[0][0], id, filename))
+            process_datafile(callable, filter, id, filename, uri)
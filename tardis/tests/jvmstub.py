@@ -0,0 +1,24 @@
+"""
+Stub JVM worker helper for JVMPool tests, serving requests without a
+JVM. Requests are (action, arg) pairs.
+"""
+import os
+import sys
+import time
+
+from tardis.filters.mytardisbf.jvmpool import get_streams, serve
+
+
+def run(action, arg=None):
+    if action == 'sleep':
+        time.sleep(arg)
+    elif action == 'exit':
+        os._exit(1)
+    elif action == 'error':
+        raise ValueError(arg)
+    return os.getpid()
+
+
+if __name__ == '__main__':
+    inp, out = get_streams()
+    serve(inp, out, run, int(sys.argv[1]))
@@ -1,6 +1,13 @@
+import os
+import shutil
+import tempfile
+import importlib
 from os import path
+from unittest import mock
 
-from django.test import TransactionTestCase
+import numpy as np
+
+from django.test import TransactionTestCase, override_settings
 
 import tardis.tests.helpers as helpers
 from tardis.filters.helpers import safe_import
@@ -87,3 +94,47 @@ class BioformatsFilterTestCase(TransactionTestCase):
 
         # Cleanup
         helpers.delete_datafile(uri)
+
+
+@override_settings(MTBF_PREVIEW_SERIES='all', MTBF_PREVIEW_THREADS=0,
+                   MTBF_PREVIEW_PROJECTION=None)
+class SharedReaderTestCase(TransactionTestCase):
+
+    def setUp(self):
+        # Imported here as it needs javabridge, like the filter itself
+        self.module = importlib.import_module(
+            'tardis.filters.mytardisbf.mytardisbf')
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def testSharedReader(self):
+        mytardisbf = self.module
+        reader = mock.MagicMock()
+        reader.get_series_count.return_value = 2
+        reader.iter_series_meta.return_value = iter(
+            [{'id': 'Image:0'}, {'id': 'Image:1'}])
+        reader.get_channel_count.return_value = 1
+        reader.get_size_c.return_value = 1
+        reader.read_preview.return_value = np.zeros((8, 8), np.uint16)
+
+        with mock.patch.object(mytardisbf, 'BioformatsReader',
+                               return_value=reader) as reader_class, \
+                mock.patch.object(mytardisbf, 'get_memo_cache',
+                                  return_value=None), \
+                mock.patch.object(mytardisbf, 'get_max_heap',
+                                  return_value=1024 ** 3):
+            meta = mytardisbf.get_meta('/data/multi.lif', self.path)
+
+        # One reader for the file, used for metadata and all previews
+        self.assertEqual(reader_class.call_count, 1)
+        self.assertEqual(reader_class.call_args[0][0], '/data/multi.lif')
+        self.assertEqual(reader.__enter__.call_count, 1)
+        self.assertEqual(reader.__exit__.call_count, 1)
+        self.assertEqual(reader.iter_series_meta.call_count, 1)
+        self.assertEqual(
+            [c[0][0] for c in reader.read_preview.call_args_list], [0, 1])
+        self.assertEqual([m['previewImage'] for m in meta], [
+            os.path.join(self.path, 'multi_s0.png'),
+            os.path.join(self.path, 'multi_s1.png')])
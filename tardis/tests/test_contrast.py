@@ -0,0 +1,65 @@
+import numpy as np
+
+from django.test import TransactionTestCase
+
+from tardis.filters.mytardisbf import contrast
+from tardis.filters.mytardisbf.contrast import stretch_contrast
+
+
+def reference(img):
+    # Previous float64 implementation
+    img = img - np.min(img)
+    return np.round(img * 255.0 / np.max(img)).astype(np.uint8)
+
+
+class StretchContrastTestCase(TransactionTestCase):
+
+    def testUint16(self):
+        img = np.random.RandomState(0).randint(100, 4000, (64, 96))
+        img = img.astype(np.uint16)
+        out = stretch_contrast(img)
+        self.assertEqual(out.dtype, np.uint8)
+        self.assertEqual(out.shape, img.shape)
+        self.assertEqual(out.min(), 0)
+        self.assertEqual(out.max(), 255)
+        diff = np.abs(out.astype(int) - reference(img).astype(int))
+        self.assertLessEqual(diff.max(), 1)
+
+    def testChunks(self):
+        img = np.random.RandomState(0).randint(0, 256, (50, 50))
+        img = img.astype(np.uint8)
+        whole = stretch_contrast(img)
+        chunk_size = contrast.CHUNK_SIZE
+        contrast.CHUNK_SIZE = 7
+        try:
+            self.assertTrue(np.array_equal(whole, stretch_contrast(img)))
+        finally:
+            contrast.CHUNK_SIZE = chunk_size
+
+    def testSigned(self):
+        img = np.array([[-1000, 0], [500, 1000]], dtype=np.int16)
+        out = stretch_contrast(img)
+        self.assertEqual(list(out.ravel()), [0, 128, 191, 255])
+
+    def testFloat(self):
+        img = np.random.RandomState(0).rand(32, 32) * 10 - 5
+        out = stretch_contrast(img)
+        self.assertEqual(out.dtype, np.uint8)
+        diff = np.abs(out.astype(int) - reference(img).astype(int))
+        self.assertLessEqual(diff.max(), 1)
+
+    def testConstant(self):
+        for dtype in (np.uint8, np.uint16, np.int32, np.float32):
+            out = stretch_contrast(np.full((4, 4), 7, dtype=dtype))
+            self.assertEqual(out.dtype, np.uint8)
+            self.assertFalse(out.any())
+
+    def testPercentiles(self):
+        img = np.tile(np.arange(100, dtype=np.uint16), (10, 1))
+        img[0, 0] = 60000  # Hot pixel
+        out = stretch_contrast(img, (1, 99))
+        # Outlier is clipped instead of compressing the range
+        self.assertEqual(out[0, 0], 255)
+        self.assertGreater(out[5, 50], 100)
+        out = stretch_contrast(img.astype(np.float32), (1, 99))
+        self.assertGreater(out[5, 50], 100)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TransactionTestCase
+
+from tardis.filters.diffractionimage.header import read_header
+from tardis.synthetic import write_raxis, write_smv
+
+
+class DiffractionHeaderTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def testSmv(self):
+        filename = os.path.join(self.path, 'test.img')
+        write_smv(filename, 64)
+        self.assertEqual(read_header(filename), {
+            'imageType': 'adsc',
+            'collectionDate': 'Sun Sep 26 15:15:16 2004',
+            'exposureTime': '1.000000',
+            'detectorSN': '457',
+            'wavelength': '0.953700',
+            'directBeamXPos': '157.500000',
+            'directBeamYPos': '157.500000',
+            'detectorDistance': '200.000000',
+            'imageSizeX': '64',
+            'imageSizeY': '64',
+            'pixelSizeX': '0.102600',
+            'pixelSizeY': '0.102600',
+            'oscillationRangeStart': '0.000000',
+            'oscillationRangeEnd': '1.000000',
+            'twoTheta': '0.000000',
+        })
+
+    def testSmvVariant(self):
+        # Rigaku SMV headers are left to diffdump
+        filename = os.path.join(self.path, 'test.img')
+        with open(filename, 'wb') as f:
+            f.write(b'{\nHEADER_BYTES=  512;\nDETECTOR_NAMES=CCD_;\n'
+                    b'CCD_DETECTOR_DIMENSIONS=1024 1024;\n}'.ljust(512))
+        self.assertIsNone(read_header(filename))
+
+    def testRaxis(self):
+        for byte_order in '><':
+            filename = os.path.join(self.path, 'test.osc')
+            write_raxis(filename, byte_order)
+            self.assertEqual(read_header(filename), {
+                'imageType': 'raxis',
+                'collectionDate': '2021-05-04',
+                'exposureTime': '3.000000',
+                'wavelength': '1.541800',
+                'directBeamXPos': '50.049999',
+                'directBeamYPos': '1.625000',
+                'detectorDistance': '120.000000',
+                'imageSizeX': '1024',
+                'imageSizeY': '1024',
+                'pixelSizeX': '0.100000',
+                'pixelSizeY': '0.100000',
+                'oscillationRangeStart': '10.000000',
+                'oscillationRangeEnd': '11.500000',
+                'twoTheta': '2.000000',
+            })
+
+    def testUnknown(self):
+        filename = os.path.join(self.path, 'test.img')
+        with open(filename, 'wb') as f:
+            f.write(b'\0' * 2048)
+        self.assertIsNone(read_header(filename))
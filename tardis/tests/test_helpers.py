@@ -0,0 +1,174 @@
+import time
+import itertools
+
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TransactionTestCase, override_settings
+
+from tardis.filters.helpers import get_suffixes, get_filters, \
+    get_dispatch_index, safe_import, get_filter, get_lock_ttl, \
+    LeaseLock, acquire_lock, renew_lock, release_lock
+
+import tardis.tests.helpers as helpers
+
+
+class DispatchIndexTestCase(TransactionTestCase):
+
+    def testSuffixes(self):
+        self.assertEqual(get_suffixes('/data/Sample.OME.TIFF'),
+                         ['ome.tiff', 'tiff'])
+        self.assertEqual(get_suffixes('scan.img.gz'), ['img.gz', 'gz'])
+        self.assertEqual(get_suffixes('/data/.hidden'), [])
+        self.assertEqual(get_suffixes('README'), [])
+
+    def testCompoundExtension(self):
+        names = [f[1][0] for f in get_filters('/data/z-series.ome.tiff')]
+        self.assertEqual(names, ['Bioformats'])
+        self.assertTrue('ome.tiff' in get_dispatch_index())
+
+    def testMultipleFilters(self):
+        names = [f[1][0] for f in get_filters('/data/SCAN_001.IMG')]
+        self.assertEqual(names, ['Bioformats', 'IMG'])
+        self.assertEqual(get_filters('/data/archive.zip'), [])
+
+    def testSettingsChanged(self):
+        filters = [(('tardis.filters.pdf.pdf.make_filter', ['img.gz']),
+                    ('PDF', 'http://tardis.edu.au/schemas/pdf/1'))]
+        with override_settings(POST_SAVE_FILTERS=filters):
+            self.assertEqual(get_filters('scan.img.gz'), filters)
+            self.assertEqual(get_filters('scan.img'), [])
+        self.assertEqual(len(get_filters('scan.img')), 2)
+
+    def testAccepts(self):
+        callable = safe_import(helpers.get_filter_settings('PDF'))
+        self.assertTrue(callable.accepts('/data/Report.PDF'))
+        self.assertFalse(callable.accepts('/data/report.csv'))
+
+
+class FilterRegistryTestCase(TransactionTestCase):
+
+    def testSameInstance(self):
+        filter = helpers.get_filter_settings('CSV')
+        callable = get_filter(filter)
+        self.assertEqual(callable.name, 'CSV')
+
+        # Entries deserialized from the broker are lists
+        serialized = [list(item) for item in filter]
+        self.assertIs(get_filter(serialized), callable)
+
+
+class CasClient(object):
+    """memcached client with gets/cas, where every write bumps a version"""
+    cache_cas = True
+
+    def __init__(self):
+        self.data = {}
+        self.cas_ids = {}
+        self.versions = itertools.count(1)
+
+    def add(self, key, value, time):
+        if key in self.data:
+            return False
+        self.data[key] = (value, next(self.versions))
+        return True
+
+    def set(self, key, value, time):
+        self.data[key] = (value, next(self.versions))
+
+    def gets(self, key):
+        value, version = self.data.get(key, (None, None))
+        if version is not None:
+            self.cas_ids[key] = version
+        return value
+
+    def cas(self, key, value, time):
+        if self.data.get(key, (None, None))[1] != self.cas_ids[key]:
+            return False
+        if time < 0:
+            del self.data[key]
+        else:
+            self.set(key, value, time)
+        return True
+
+    def reset_cas(self):
+        self.cas_ids = {}
+
+
+class CasCache(BaseCache):
+    """Cache backend over CasClient, as MemcachedCache with cache_cas"""
+
+    def __init__(self):
+        super().__init__({})
+        self._cache = CasClient()
+
+    def add(self, key, value, timeout=None, version=None):
+        return self._cache.add(self.make_key(key), value, timeout)
+
+    def get(self, key, default=None, version=None):
+        return self._cache.data.get(self.make_key(key), (default,))[0]
+
+    def get_backend_timeout(self, timeout=None):
+        return timeout
+
+
+class LeaseLockTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.backend = LocMemCache('locks', {})
+
+    def testOwner(self):
+        token = acquire_lock('lock', 60, self.backend)
+        self.assertIsNotNone(token)
+        self.assertIsNone(acquire_lock('lock', 60, self.backend))
+
+        # Other owner can't release the lock
+        release_lock('lock', 'other', self.backend)
+        self.assertEqual(self.backend.get('lock'), token)
+        release_lock('lock', token, self.backend)
+        self.assertIsNone(self.backend.get('lock'))
+
+    def testCas(self):
+        backend = CasCache()
+        token = acquire_lock('lock', 60, backend)
+        self.assertTrue(renew_lock('lock', token, 60, backend))
+        self.assertFalse(renew_lock('lock', 'other', 60, backend))
+
+        release_lock('lock', 'other', backend)
+        self.assertEqual(backend.get('lock'), token)
+        release_lock('lock', token, backend)
+        self.assertIsNone(backend.get('lock'))
+
+    def testCasRace(self):
+        backend = CasCache()
+        client = backend._cache
+        token = acquire_lock('lock', 60, backend)
+        gets = client.gets
+
+        def expire_and_take(key):
+            # Lease expires and another owner takes it after the check
+            value = gets(key)
+            client.set(key, 'other', 60)
+            return value
+
+        client.gets = expire_and_take
+        self.assertFalse(renew_lock('lock', token, 60, backend))
+        release_lock('lock', token, backend)
+        self.assertEqual(backend.get('lock'), 'other')
+
+    def testHeartbeat(self):
+        lock = LeaseLock('lock', 1, heartbeat=0.1, backend=self.backend)
+        self.assertTrue(lock.acquire())
+        time.sleep(1.5)
+        # Lease outlives its ttl while held
+        self.assertFalse(LeaseLock('lock', 1, backend=self.backend).acquire())
+        lock.release()
+        self.assertIsNone(self.backend.get('lock'))
+
+    @override_settings(FILTER_LOCK_TTL=300, FILTER_LOCK_TTL_PER_GB=1024 ** 2,
+                       FILTER_LOCK_TTL_FACTORS={'Bioformats': 2})
+    def testTtl(self):
+        self.assertEqual(get_lock_ttl('PDF', '/does/not/exist'), 300)
+        self.assertEqual(get_lock_ttl('Bioformats', '/does/not/exist'), 600)
+        filename = helpers.get_assets_file('sample.nd2')
+        # 1 second per KB of file size
+        self.assertEqual(get_lock_ttl('PDF', filename), 300 + 264)
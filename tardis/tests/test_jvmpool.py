@@ -0,0 +1,119 @@
+import time
+import threading
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+
+from tardis.filters.mytardisbf.jvmpool import JVMPool
+
+
+@override_settings(MTBF_JVM_MAX_FILES=100, MTBF_JVM_TIMEOUT=None)
+class JVMPoolTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.pool = JVMPool(1, module='tardis.tests.jvmstub')
+
+    def tearDown(self):
+        self.pool.close()
+
+    def testReuse(self):
+        pid = self.pool.get_meta('pid')
+        self.assertEqual(self.pool.get_meta('pid'), pid)
+        self.assertEqual(self.pool.started, 1)
+
+    def testError(self):
+        pid = self.pool.get_meta('pid')
+        with self.assertRaisesRegex(Exception, 'bad file'):
+            self.pool.get_meta('error', 'bad file')
+        # Errors of get_meta keep the worker
+        self.assertEqual(self.pool.get_meta('pid'), pid)
+
+    @override_settings(MTBF_JVM_MAX_FILES=2)
+    def testRecycle(self):
+        pid = self.pool.get_meta('pid')
+        self.assertEqual(self.pool.get_meta('pid'), pid)
+        # Worker exits after max files and is replaced
+        self.assertNotEqual(self.pool.get_meta('pid'), pid)
+        self.assertEqual(self.pool.started, 1)
+
+    def testDied(self):
+        pid = self.pool.get_meta('pid')
+        with self.assertRaisesRegex(Exception, 'exited unexpectedly'):
+            self.pool.get_meta('exit')
+        self.assertEqual(self.pool.started, 0)
+        self.assertNotEqual(self.pool.get_meta('pid'), pid)
+
+    @override_settings(MTBF_JVM_TIMEOUT=0.5)
+    def testTimeout(self):
+        pid = self.pool.get_meta('pid')
+        start = time.time()
+        with self.assertRaisesRegex(Exception, 'timed out'):
+            self.pool.get_meta('sleep', 30)
+        self.assertLess(time.time() - start, 10)
+        self.assertNotEqual(self.pool.get_meta('pid'), pid)
+
+    def testBusy(self):
+        pid = self.pool.get_meta('pid')
+        done = []
+
+        def run():
+            self.pool.get_meta('sleep', 0.5)
+            done.append(time.time())
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        time.sleep(0.1)
+        # Waits for the only worker instead of starting another
+        self.assertEqual(self.pool.get_meta('pid'), pid)
+        end = time.time()
+        thread.join()
+        self.assertGreaterEqual(end, done[0])
+        self.assertEqual(self.pool.started, 1)
+
+    def testSpawnFailure(self):
+        with mock.patch('tardis.filters.mytardisbf.jvmpool.subprocess.Popen',
+                        side_effect=OSError('no memory')):
+            with self.assertRaises(OSError):
+                self.pool.get_meta('pid')
+        self.assertEqual(self.pool.started, 0)
+        # Doesn't block once workers can be started again
+        self.assertIsInstance(self.pool.get_meta('pid'), int)
+        self.assertEqual(self.pool.started, 1)
+
+    def testSpawnFailureWakesWaiter(self):
+        spawn = self.pool.spawn
+        failing = threading.Event()
+        fail = threading.Event()
+
+        def spawn_once():
+            if not failing.is_set():
+                failing.set()
+                fail.wait()
+                raise OSError('no memory')
+            return spawn()
+
+        errors, results = [], []
+
+        def run(out):
+            try:
+                out.append(self.pool.get_meta('pid'))
+            except OSError as e:
+                errors.append(e)
+
+        with mock.patch.object(self.pool, 'spawn', side_effect=spawn_once):
+            first = threading.Thread(target=run, args=(results,))
+            first.start()
+            failing.wait()
+            # Pool is full while the first worker starts, so this waits
+            second = threading.Thread(target=run, args=(results,))
+            second.start()
+            time.sleep(0.1)
+            self.assertTrue(second.is_alive())
+            fail.set()
+            first.join()
+            second.join(30)
+
+        self.assertFalse(second.is_alive())
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(self.pool.started, 1)
@@ -0,0 +1,90 @@
+import os
+import time
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from tardis.filters.mytardisbf.memo import MemoCache
+
+
+class MemoCacheTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = MemoCache(os.path.join(self.path, 'memo'), 1000)
+        self.filename = os.path.join(self.path, 'image.lif')
+        with open(self.filename, 'wb') as f:
+            f.write(b'lif')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def add_memo(self, directory, size):
+        # Memoizer nests memo files under the absolute path of the file
+        memo_dir = os.path.join(directory, self.path.lstrip(os.sep))
+        os.makedirs(memo_dir, exist_ok=True)
+        with open(os.path.join(memo_dir, '.image.lif.bfmemo'), 'wb') as f:
+            f.write(b'\0' * size)
+
+    def testDirectory(self):
+        directory = self.cache.get_directory(self.filename)
+        self.assertTrue(os.path.isdir(directory))
+        self.assertEqual(self.cache.get_directory(self.filename), directory)
+        # Changed files get a new directory
+        with open(self.filename, 'ab') as f:
+            f.write(b'more')
+        self.assertNotEqual(self.cache.get_directory(self.filename),
+                            directory)
+
+    def testEvict(self):
+        directories = []
+        for i in range(3):
+            filename = os.path.join(self.path, 'image%d.lif' % i)
+            with open(filename, 'wb') as f:
+                f.write(b'lif')
+            directory = self.cache.get_directory(filename)
+            self.add_memo(directory, 400)
+            os.utime(directory, (time.time() - 10 + i,) * 2)
+            directories.append(directory)
+
+        self.cache.evict()
+        self.assertFalse(os.path.exists(directories[0]))
+        self.assertTrue(os.path.exists(directories[1]))
+        self.assertTrue(os.path.exists(directories[2]))
+
+    def testUpdate(self):
+        with mock.patch.object(self.cache, 'evict',
+                               wraps=self.cache.evict) as evict:
+            directory = self.cache.get_directory(self.filename)
+            size = self.cache.get_size(directory)
+            # Nothing written, nothing to evict
+            self.cache.update(directory, size)
+            self.assertEqual(evict.call_count, 0)
+
+            # First memo scans the cache, later ones are tracked
+            self.add_memo(directory, 300)
+            self.cache.update(directory, size)
+            self.assertEqual(evict.call_count, 1)
+            self.assertEqual(self.cache.size, 300)
+
+            filename = os.path.join(self.path, 'other.lif')
+            with open(filename, 'wb') as f:
+                f.write(b'lif')
+            other = self.cache.get_directory(filename)
+            self.add_memo(other, 400)
+            self.cache.update(other, 0)
+            self.assertEqual(evict.call_count, 1)
+            self.assertEqual(self.cache.size, 700)
+
+            # Going over max_size scans and evicts
+            os.utime(directory, (time.time() - 10,) * 2)
+            self.add_memo(directory, 700)
+            self.cache.update(directory, 300)
+            self.assertEqual(evict.call_count, 2)
+            self.assertFalse(os.path.exists(directory))
+            self.assertEqual(self.cache.size, 400)
+
+    def testEvictMissing(self):
+        MemoCache(os.path.join(self.path, 'missing'), 0).evict()
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TransactionTestCase, override_settings
+
+from tardis.filters.mytardisbf import memory
+from tardis.filters.mytardisbf.memory import parse_size, get_memory_limit, \
+    get_max_heap_size
+
+
+class HeapSizeTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.limit_paths = memory.CGROUP_LIMIT_PATHS
+        self.limit_path = os.path.join(self.path, 'memory.max')
+        memory.CGROUP_LIMIT_PATHS = (self.limit_path,)
+
+    def tearDown(self):
+        memory.CGROUP_LIMIT_PATHS = self.limit_paths
+        shutil.rmtree(self.path)
+
+    def set_limit(self, value):
+        with open(self.limit_path, 'w') as f:
+            f.write(value + '\n')
+
+    def testParseSize(self):
+        self.assertEqual(parse_size('512m'), 512 * 1024 ** 2)
+        self.assertEqual(parse_size('4G'), 4 * 1024 ** 3)
+        self.assertEqual(parse_size(1024), 1024)
+        with self.assertRaises(ValueError):
+            parse_size('lots')
+
+    def testMemoryLimit(self):
+        physical = memory.get_physical_memory()
+        self.assertEqual(get_memory_limit(), physical)
+        self.set_limit('max')
+        self.assertEqual(get_memory_limit(), physical)
+        self.set_limit(str(2 ** 62))
+        self.assertEqual(get_memory_limit(), physical)
+        self.set_limit(str(1024 ** 3))
+        self.assertEqual(get_memory_limit(), 1024 ** 3)
+
+    @override_settings(MTBF_MAX_HEAP_SIZE='auto', MTBF_WORKER_CONCURRENCY=2,
+                       MTBF_JVM_POOL_SIZE=1, MTBF_HEAP_MEMORY_RATIO=0.5)
+    def testAuto(self):
+        self.set_limit(str(2 * 1024 ** 3))
+        self.assertEqual(get_max_heap_size(), '512m')
+        with override_settings(MTBF_JVM_POOL_SIZE=0):
+            self.assertEqual(get_max_heap_size(), '512m')
+        with override_settings(MTBF_WORKER_CONCURRENCY=4):
+            self.assertEqual(get_max_heap_size(), '256m')
+        # Never below minimum
+        self.set_limit(str(128 * 1024 ** 2))
+        self.assertEqual(get_max_heap_size(), '256m')
+
+    @override_settings(MTBF_MAX_HEAP_SIZE='1G')
+    def testFixed(self):
+        self.assertEqual(get_max_heap_size(), '1G')
@@ -0,0 +1,79 @@
+import os
+import time
+import socket
+import tempfile
+import subprocess
+
+from django.test import TransactionTestCase, override_settings
+
+from tardis.filters.metrics import Metrics, timer, export_metrics, \
+    remove_exited_metrics
+
+
+class MetricsTestCase(TransactionTestCase):
+
+    def testRender(self):
+        metrics = Metrics()
+        metrics.observe('PDF', 'thumbnail', 0.2)
+        metrics.observe('PDF', 'thumbnail', 20)
+        metrics.inc('results_total', 'PDF', result='success')
+        metrics.inc('bytes_total', 'PDF', 1024)
+
+        text = metrics.render(worker='w1')
+        self.assertIn('# TYPE mytardis_filter_duration_seconds histogram',
+                      text)
+        self.assertIn('mytardis_filter_duration_seconds_bucket{worker="w1",'
+                      'filter="PDF",stage="thumbnail",le="0.5"} 1', text)
+        self.assertIn('mytardis_filter_duration_seconds_bucket{worker="w1",'
+                      'filter="PDF",stage="thumbnail",le="+Inf"} 2', text)
+        self.assertIn('mytardis_filter_duration_seconds_count{worker="w1",'
+                      'filter="PDF",stage="thumbnail"} 2', text)
+        self.assertIn('mytardis_filter_results_total{worker="w1",'
+                      'filter="PDF",result="success"} 1', text)
+        self.assertIn('mytardis_filter_bytes_total{worker="w1",'
+                      'filter="PDF"} 1024', text)
+
+    def testExport(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with override_settings(METRICS_PATH=tmpdir):
+                with timer('CSV', 'extract'):
+                    pass
+                export_metrics(force=True)
+            files = os.listdir(tmpdir)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].endswith('.prom'))
+            with open(os.path.join(tmpdir, files[0])) as f:
+                self.assertIn('stage="extract"', f.read())
+
+    def testDeferredExport(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with override_settings(METRICS_PATH=tmpdir, METRICS_INTERVAL=0.3):
+                export_metrics(force=True)
+                with timer('CSV', 'deferred'):
+                    pass
+                # Throttled, written once the interval has passed
+                export_metrics()
+                filename = os.listdir(tmpdir)[0]
+                with open(os.path.join(tmpdir, filename)) as f:
+                    self.assertNotIn('stage="deferred"', f.read())
+                time.sleep(0.6)
+                with open(os.path.join(tmpdir, filename)) as f:
+                    self.assertIn('stage="deferred"', f.read())
+
+    def testRemoveExited(self):
+        with subprocess.Popen(['true']) as proc:
+            proc.wait()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            names = ['filters-%s-%s.prom' % (socket.gethostname(), pid)
+                     for pid in (proc.pid, os.getppid(), os.getpid())]
+            names.append('filters-otherhost-%s.prom' % proc.pid)
+            for name in names:
+                with open(os.path.join(tmpdir, name), 'w'):
+                    pass
+
+            with override_settings(METRICS_PATH=tmpdir):
+                # Final export of an exited process is kept for a while
+                remove_exited_metrics(60)
+                self.assertEqual(sorted(os.listdir(tmpdir)), sorted(names))
+                remove_exited_metrics()
+            self.assertEqual(sorted(os.listdir(tmpdir)), sorted(names[1:]))
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from django.test import TransactionTestCase, override_settings
+
+from tardis.filters.mytardisbf.native import get_native_meta
+
+FORMATS = ['bmp', 'gif', 'jpeg', 'jpg', 'png', 'tif', 'tiff']
+
+
+@override_settings(MTBF_NATIVE_FORMATS=FORMATS)
+class NativeMetaTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def get_assets_file(self, filename):
+        return os.path.join(os.path.dirname(__file__), 'assets', filename)
+
+    def testJpeg(self):
+        meta = get_native_meta(self.get_assets_file('sample.jpg'), self.path)
+        self.assertEqual(len(meta), 1)
+        meta = meta[0]
+        self.assertEqual(meta['name'], 'sample.jpg')
+        self.assertEqual(meta['type'], 'uint8')
+        self.assertEqual((meta['sizex'], meta['sizey'], meta['sizec']),
+                         ('2000', '2000', '3'))
+        self.assertEqual(meta['samplesperpixel'], ['Channel 0: 3'])
+        self.assertEqual(meta['previewImage'],
+                         os.path.join(self.path, 'sample_s0.png'))
+        with Image.open(meta['previewImage']) as im:
+            self.assertEqual(im.size, (256, 256))
+            self.assertEqual(im.mode, 'RGB')
+
+    def testTiff16(self):
+        filename = os.path.join(self.path, 'gray.tif')
+        img = np.random.RandomState(0).randint(0, 4000, (300, 600))
+        Image.fromarray(img.astype(np.uint16)).save(filename)
+        meta = get_native_meta(filename, self.path)[0]
+        self.assertEqual(meta['type'], 'uint16')
+        self.assertEqual(meta['sizec'], '1')
+        with Image.open(meta['previewImage']) as im:
+            self.assertEqual(im.size, (256, 128))
+            self.assertEqual(im.mode, 'L')
+
+    def testFallback(self):
+        # OME-TIFF is left to Bio-Formats
+        self.assertIsNone(get_native_meta(
+            self.get_assets_file('single-channel.ome.tif'), self.path))
+        # Not a configured format
+        self.assertIsNone(get_native_meta(
+            self.get_assets_file('sample.nd2'), self.path))
+        # Multi-page
+        filename = os.path.join(self.path, 'pages.tif')
+        pages = [Image.new('L', (8, 8)) for _ in range(2)]
+        pages[0].save(filename, save_all=True, append_images=pages[1:])
+        self.assertIsNone(get_native_meta(filename, self.path))
+        # Not an image
+        filename = os.path.join(self.path, 'broken.png')
+        with open(filename, 'wb') as f:
+            f.write(b'not a png')
+        self.assertIsNone(get_native_meta(filename, self.path))
+
+    @override_settings(MTBF_NATIVE_FORMATS=[])
+    def testDisabled(self):
+        self.assertIsNone(get_native_meta(
+            self.get_assets_file('sample.jpg'), self.path))
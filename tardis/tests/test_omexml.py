@@ -0,0 +1,52 @@
+import io
+
+from django.test import TransactionTestCase
+
+from tardis.filters.mytardisbf.omexml import iter_series_meta
+
+NS = 'http://www.openmicroscopy.org/Schemas/OME/2016-06'
+
+
+def get_xml(images):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><OME xmlns="%s">'
+        '<Instrument ID="Instrument:0"/>%s'
+        '<StructuredAnnotations>'
+        '<XMLAnnotation ID="Annotation:0"><Value>x</Value></XMLAnnotation>'
+        '</StructuredAnnotations></OME>' % (NS, ''.join(
+            '<Image ID="Image:%d" Name="series %d">'
+            '<Pixels ID="Pixels:%d" DimensionOrder="XYCZT" Type="uint16" '
+            'SizeX="64" SizeY="32" SizeZ="1" SizeC="2" SizeT="1" '
+            'BigEndian="false">'
+            '<Channel ID="Channel:%d:0" Name="DAPI" SamplesPerPixel="1" '
+            'EmissionWavelength="461"/>'
+            '<Channel ID="Channel:%d:1" SamplesPerPixel="1"/>'
+            '<TiffData/></Pixels></Image>' % ((i,) * 5)
+            for i in range(images)))).encode('utf-8')
+
+
+class IterSeriesMetaTestCase(TransactionTestCase):
+
+    def testSeriesMeta(self):
+        meta = list(iter_series_meta(io.BytesIO(get_xml(3))))
+        self.assertEqual(len(meta), 3)
+        self.assertEqual(meta[2], {
+            'id': 'Image:2',
+            'name': 'series 2',
+            'dimensionorder': 'XYCZT',
+            'type': 'uint16',
+            'sizex': '64',
+            'sizey': '32',
+            'sizez': '1',
+            'sizec': '2',
+            'sizet': '1',
+            'samplesperpixel': ['Channel 0: 1', 'Channel 1: 1'],
+            'emissionwavelength': ['Channel 0: 461'],
+        })
+
+    def testIncremental(self):
+        # Images are yielded before the rest of the document is read
+        xml = get_xml(1000)
+        it = iter_series_meta(io.BytesIO(xml))
+        self.assertEqual(next(it)['id'], 'Image:0')
+        self.assertEqual(len(list(it)), 999)
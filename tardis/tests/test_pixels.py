@@ -0,0 +1,40 @@
+import numpy as np
+
+from django.test import TransactionTestCase
+
+from tardis.filters.mytardisbf.pixels import get_dtype, get_plane_view
+from tardis.filters.mytardisbf.resample import block_mean
+
+
+class PlaneViewTestCase(TransactionTestCase):
+
+    def testDtype(self):
+        self.assertEqual(get_dtype(3, True), np.dtype('<u2'))
+        self.assertEqual(get_dtype(6, False), np.dtype('>f4'))
+        self.assertEqual(get_dtype(8, False), np.dtype('u1'))
+
+    def testBigEndian(self):
+        img = np.arange(12, dtype='>u2').reshape(3, 4)
+        # Buffers reused for larger planes have trailing bytes
+        data = np.zeros(64, dtype=np.uint8)
+        data[:24] = np.frombuffer(img.tobytes(), dtype=np.uint8)
+        out = get_plane_view(data, get_dtype(3, False), 4, 3)
+        self.assertTrue(np.array_equal(out, img))
+        self.assertTrue(np.shares_memory(out, data))
+        # Reduced planes are in native byte order
+        self.assertTrue(block_mean(out, 2).dtype.isnative)
+        self.assertTrue(block_mean(out, 1).dtype.isnative)
+        self.assertTrue(np.array_equal(block_mean(out, 1), img))
+
+    def testRgb(self):
+        img = np.arange(24, dtype=np.uint8).reshape(2, 4, 3)
+        interleaved = np.frombuffer(img.tobytes(), dtype=np.uint8)
+        planar = np.frombuffer(img.transpose(2, 0, 1).tobytes(),
+                               dtype=np.uint8)
+        dtype = get_dtype(1, True)
+        for data, il in ((interleaved, True), (planar, False)):
+            out = get_plane_view(data, dtype, 4, 2, 3, il)
+            self.assertTrue(np.array_equal(out, img))
+            self.assertTrue(np.shares_memory(out, data))
+            out = get_plane_view(data, dtype, 4, 2, 3, il, c=1)
+            self.assertTrue(np.array_equal(out, img[:, :, 1]))
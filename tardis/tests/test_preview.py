@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from django.test import TransactionTestCase
+
+from tardis.filters.mytardisbf.preview import save_image, make_preview, \
+    write_preview, get_preview_series, get_preview_policy
+
+
+class SaveImageTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def testGray(self):
+        img = np.arange(256, dtype=np.uint8).reshape(16, 16)
+        output_path = os.path.join(self.path, 'preview.png')
+        save_image(img, output_path)
+        with Image.open(output_path) as im:
+            self.assertEqual(im.mode, 'L')
+            self.assertTrue(np.array_equal(np.asarray(im), img))
+        # Only the preview is left in the directory
+        self.assertEqual(os.listdir(self.path), ['preview.png'])
+
+    def testRgb(self):
+        img = np.zeros((8, 12, 3), dtype=np.uint8)
+        img[..., 1] = 200
+        output_path = os.path.join(self.path, 'preview.png')
+        save_image(img, output_path)
+        with Image.open(output_path) as im:
+            self.assertEqual(im.mode, 'RGB')
+            self.assertEqual(im.size, (12, 8))
+            self.assertEqual(im.getpixel((0, 0)), (0, 200, 0))
+
+    def testStretch(self):
+        img = np.array([[0, 1000], [2000, 4000]], dtype=np.uint16)
+        output_path = os.path.join(self.path, 'preview.png')
+        save_image(img, output_path)
+        with Image.open(output_path) as im:
+            self.assertEqual(np.asarray(im).max(), 255)
+
+    def testOverwrite(self):
+        img = np.zeros((4, 4), dtype=np.uint8)
+        output_path = os.path.join(self.path, 'preview.png')
+        save_image(img, output_path)
+        with self.assertRaises(Exception):
+            save_image(img, output_path)
+        save_image(img + 1, output_path, overwrite=True)
+        with Image.open(output_path) as im:
+            self.assertEqual(im.getpixel((0, 0)), 1)
+
+    def testMakePreview(self):
+        img = np.random.RandomState(0).randint(100, 4000, (1024, 512))
+        out = make_preview(img.astype(np.uint16), 256)
+        self.assertEqual(out.shape, (256, 128))
+        self.assertEqual(out.dtype, np.uint8)
+        rgb = np.full((512, 512, 3), 100, dtype=np.uint8)
+        out = make_preview(rgb, 256, rgb=True)
+        self.assertEqual(out.shape, (256, 256, 3))
+        self.assertEqual(out[0, 0, 0], 100)
+
+    def testWritePreviewThreads(self):
+        img = np.random.RandomState(0).randint(0, 4000, (600, 600))
+        paths = [os.path.join(self.path, 's%d.png' % i) for i in range(8)]
+        with ThreadPoolExecutor(4) as executor:
+            for f in [executor.submit(write_preview, img, path)
+                      for path in paths]:
+                f.result()
+        for path in paths:
+            with Image.open(path) as im:
+                self.assertEqual(im.size, (256, 256))
+
+
+class PreviewSeriesTestCase(TransactionTestCase):
+
+    def testPolicies(self):
+        self.assertEqual(get_preview_series(200), [0])
+        self.assertEqual(get_preview_series(3, 'all'), [0, 1, 2])
+        self.assertEqual(get_preview_series(200, 'first_n', 3), [0, 1, 2])
+        self.assertEqual(get_preview_series(2, 'first_n', 3), [0, 1])
+        self.assertEqual(get_preview_series(0, 'all'), [])
+
+    def testSample(self):
+        self.assertEqual(get_preview_series(201, 'sample', 5),
+                         [0, 50, 100, 150, 200])
+        self.assertEqual(get_preview_series(3, 'sample', 5), [0, 1, 2])
+        self.assertEqual(get_preview_series(10, 'sample', 1), [0])
+
+    def testUnknown(self):
+        with self.assertRaises(ValueError):
+            get_preview_series(10, 'random')
+
+    def testPolicy(self):
+        self.assertEqual(get_preview_policy('sample'), 'sample')
+        self.assertEqual(get_preview_policy(None), 'first')
+        # Invalid settings fall back to the first series
+        with self.assertLogs('tardis.filters.mytardisbf.preview', 'ERROR'):
+            self.assertEqual(get_preview_policy('random'), 'first')
@@ -0,0 +1,49 @@
+import numpy as np
+
+from django.test import TransactionTestCase
+
+from tardis.filters.mytardisbf.projection import get_projection_planes, \
+    get_projection_mode, project
+
+
+class ProjectionTestCase(TransactionTestCase):
+
+    def testPlanes(self):
+        self.assertEqual(get_projection_planes(3), [(0, 0), (1, 0), (2, 0)])
+        self.assertEqual(get_projection_planes(2, 2, over_t=True),
+                         [(0, 0), (1, 0), (0, 1), (1, 1)])
+        self.assertEqual(get_projection_planes(0, 5), [(0, 0)])
+        self.assertEqual(get_projection_planes(100, max_planes=4),
+                         [(0, 0), (25, 0), (50, 0), (75, 0)])
+
+    def testMax(self):
+        stack = np.random.RandomState(0).randint(0, 4000, (5, 8, 8))
+        stack = stack.astype(np.uint16)
+        out = project(iter(stack), 'max')
+        self.assertEqual(out.dtype, np.uint16)
+        self.assertTrue(np.array_equal(out, stack.max(axis=0)))
+        # Planes are not modified
+        self.assertTrue(np.array_equal(stack[0], stack[0].copy()))
+
+    def testMean(self):
+        stack = np.random.RandomState(0).randint(0, 256, (5, 8, 8, 3))
+        stack = stack.astype(np.uint8)
+        out = project((plane for plane in stack), 'mean')
+        self.assertEqual(out.dtype, np.uint8)
+        self.assertTrue(np.array_equal(
+            out, np.rint(stack.mean(axis=0)).astype(np.uint8)))
+
+    def testInvalid(self):
+        with self.assertRaises(ValueError):
+            project([np.zeros((2, 2))], 'median')
+        with self.assertRaises(ValueError):
+            project([], 'max')
+
+    def testMode(self):
+        self.assertEqual(get_projection_mode('max'), 'max')
+        self.assertIsNone(get_projection_mode(None))
+        self.assertIsNone(get_projection_mode(''))
+        # Invalid settings fall back to no projection
+        with self.assertLogs(
+                'tardis.filters.mytardisbf.projection', 'ERROR'):
+            self.assertIsNone(get_projection_mode('median'))
@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from tardis.publisher import MetadataPublisher
+
+
+@mock.patch('tardis.publisher.app')
+class MetadataPublisherTestCase(TransactionTestCase):
+
+    def testSingle(self, app):
+        publisher = MetadataPublisher(batch_size=0)
+        publisher.publish(1, 'PDF', 'schema', {'previewImage': 'a.png'})
+
+        args = app.send_task.call_args
+        self.assertEqual(args[0][0], 'tardis_portal.datafile.save_metadata')
+        self.assertEqual(args[1]['args'],
+                         [1, 'PDF', 'schema', {'previewImage': 'a.png'}])
+
+    def testBatch(self, app):
+        publisher = MetadataPublisher(
+            batch_size=2, interval=60, batch_task='portal.save_batch')
+        with publisher.batch():
+            for id in range(3):
+                publisher.publish(id, 'PDF', 'schema', {})
+
+            # First two results are sent as a batch
+            self.assertEqual(app.send_task.call_count, 1)
+            args = app.send_task.call_args
+            self.assertEqual(args[0][0], 'portal.save_batch')
+            self.assertEqual([item[0] for item in args[1]['args'][0]],
+                             [0, 1])
+
+        # Last result is sent by the end of the batch
+        self.assertEqual(app.send_task.call_count, 2)
+        self.assertEqual(app.send_task.call_args[1]['args'][0], 2)
+        self.assertIsNone(publisher.timer)
+
+    def testOutsideBatch(self, app):
+        # Results of single tasks are never buffered
+        publisher = MetadataPublisher(
+            batch_size=2, interval=60, batch_task='portal.save_batch')
+        publisher.publish(1, 'PDF', 'schema', {})
+
+        self.assertEqual(app.send_task.call_count, 1)
+        self.assertEqual(app.send_task.call_args[0][0],
+                         'tardis_portal.datafile.save_metadata')
+        self.assertEqual(publisher.buffer, [])
+
+    def testNoBatchTask(self, app):
+        # Batching is opt-in with a batch task
+        publisher = MetadataPublisher(batch_size=2, interval=60)
+        with publisher.batch():
+            publisher.publish(1, 'PDF', 'schema', {})
+            publisher.publish(2, 'PDF', 'schema', {})
+            self.assertEqual(app.send_task.call_count, 2)
+
+        self.assertEqual(app.send_task.call_args[0][0],
+                         'tardis_portal.datafile.save_metadata')
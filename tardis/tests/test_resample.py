@@ -0,0 +1,61 @@
+import numpy as np
+
+from django.test import TransactionTestCase
+
+from tardis.filters.mytardisbf.resample import block_mean, \
+    get_zoom_factor, thumbnail
+
+
+class ResampleTestCase(TransactionTestCase):
+
+    def testBlockMean(self):
+        img = np.arange(30, dtype=np.uint16).reshape(5, 6)
+        out = block_mean(img, 2)
+        self.assertEqual(out.shape, (2, 3))
+        self.assertEqual(out.dtype, np.uint16)
+        # Mean of 0, 1, 6, 7
+        self.assertEqual(out[0, 0], 4)
+
+    def testBlockMeanRgb(self):
+        img = np.ones((8, 8, 3), dtype=np.uint8) * [10, 20, 30]
+        out = block_mean(img.astype(np.uint8), 4)
+        self.assertEqual(out.shape, (2, 2, 3))
+        self.assertEqual(list(out[1, 1]), [10, 20, 30])
+
+    def testTiledMatchesWhole(self):
+        # Reducing tiles of multiples of k gives the whole plane result
+        img = np.random.RandomState(0).randint(0, 4000, (64, 96))
+        whole = block_mean(img, 4)
+        tiled = np.vstack([np.hstack([block_mean(img[y:y + 16, x:x + 32], 4)
+                                      for x in range(0, 96, 32)])
+                           for y in range(0, 64, 16)])
+        self.assertTrue(np.array_equal(whole, tiled))
+
+    def testZoomFactor(self):
+        img = np.zeros((100, 50))
+        self.assertEqual(get_zoom_factor(img, 256), 1.0)
+        self.assertEqual(get_zoom_factor(img, 256, upscale=True), 2.56)
+        self.assertEqual(get_zoom_factor(np.zeros((1024, 512)), 256), 0.25)
+
+    def testThumbnail(self):
+        img = np.random.RandomState(0).randint(0, 4000, (1000, 600))
+        img = img.astype(np.uint16)
+        out = thumbnail(img, 256)
+        self.assertEqual(out.shape, (256, 154))
+        self.assertEqual(out.dtype, np.uint16)
+        self.assertAlmostEqual(out.mean(), img.mean(), delta=10)
+
+    def testThumbnailRgb(self):
+        img = np.ones((300, 400, 3), dtype=np.uint8) * [10, 20, 30]
+        out = thumbnail(img.astype(np.uint8), 256)
+        self.assertEqual(out.shape, (192, 256, 3))
+        self.assertEqual(list(out[100, 100]), [10, 20, 30])
+
+    def testThumbnailIntegerFactor(self):
+        img = np.arange(16, dtype=np.uint8).reshape(4, 4)
+        self.assertTrue(np.array_equal(thumbnail(img, 2), block_mean(img, 2)))
+
+    def testThumbnailNoUpscale(self):
+        img = np.zeros((10, 20), dtype=np.uint8)
+        self.assertIs(thumbnail(img, 256), img)
+        self.assertEqual(thumbnail(img, 256, upscale=True).shape, (128, 256))
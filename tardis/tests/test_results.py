@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+
+import tardis.tests.helpers as helpers
+from tardis.filters.helpers import get_thumbnail_paths
+from tardis.filters.results import ResultCache
+
+
+class ResultCacheTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = os.path.join(self.path, 'metadata')
+        self.cache = ResultCache(os.path.join(self.path, 'cache'),
+                                 1024 ** 2, 1024 ** 2)
+        self.filter = helpers.get_filter_settings('PDF')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def make_result(self, id, filename, uri):
+        thumb_rel_path, thumb_abs_path = get_thumbnail_paths(
+            id, filename, uri)
+        os.makedirs(os.path.dirname(thumb_abs_path))
+        with open(thumb_abs_path, 'wb') as f:
+            f.write(b'thumbnail')
+        return {'previewImage': thumb_rel_path}
+
+    def testHit(self):
+        filename = helpers.get_assets_file('sample.pdf')
+        with override_settings(METADATA_STORE_PATH=self.store):
+            key = self.cache.get_key(self.filter, filename)
+            self.assertIsNone(self.cache.get(key, 2, filename, 'b/x.pdf'))
+
+            self.cache.put(key, self.make_result(1, filename, 'a/x.pdf'),
+                           filename)
+            metadata = self.cache.get(key, 2, filename, 'b/x.pdf')
+            # Same preview path as a cold run on the datafile
+            cold = get_thumbnail_paths(2, filename, 'b/x.pdf')[0]
+
+        self.assertEqual(metadata['previewImage'], cold)
+        self.assertEqual(cold, 'b/2/sample.pdf.png')
+        with open(os.path.join(self.store, cold), 'rb') as f:
+            self.assertEqual(f.read(), b'thumbnail')
+
+    def testHitRenamed(self):
+        # Bioformats names previews <stem>_s0.png with absolute paths
+        filename = os.path.join(self.path, 'a.tif')
+        other = os.path.join(self.path, 'b.tif')
+        shutil.copyfile(helpers.get_assets_file('sample.pdf'), filename)
+        shutil.copyfile(filename, other)
+        with override_settings(METADATA_STORE_PATH=self.store):
+            key = self.cache.get_key(self.filter, filename)
+            thumb_dir = os.path.dirname(
+                get_thumbnail_paths(1, filename, 'a/a.tif')[1])
+            os.makedirs(thumb_dir)
+            preview = os.path.join(thumb_dir, 'a_s0.png')
+            with open(preview, 'wb') as f:
+                f.write(b'thumbnail')
+            self.cache.put(key, {'previewImage': preview}, filename)
+
+            self.assertEqual(self.cache.get_key(self.filter, other), key)
+            metadata = self.cache.get(key, 2, other, 'b/b.tif')
+
+        self.assertEqual(metadata['previewImage'],
+                         os.path.join(self.store, 'b/2/b_s0.png'))
+        self.assertTrue(os.path.exists(metadata['previewImage']))
+
+    def testKey(self):
+        filename = helpers.get_assets_file('sample.pdf')
+        key = self.cache.get_key(self.filter, filename)
+        other = helpers.get_filter_settings('CSV')
+        self.assertNotEqual(key, self.cache.get_key(other, filename))
+        self.assertEqual(
+            key, self.cache.get_key([list(i) for i in self.filter], filename))
+
+        # Large files are not cached
+        self.cache.max_file_size = 10
+        self.assertIsNone(self.cache.get_key(self.filter, filename))
+
+    def testEviction(self):
+        self.cache.max_size = 0
+        with override_settings(METADATA_STORE_PATH=self.store):
+            self.cache.put('aa', {'name': 'sample'}, 'x.pdf')
+            self.assertIsNone(self.cache.get('aa', 1, 'x.pdf', 'a/x.pdf'))
+
+    def testEvictionScan(self):
+        # The cache directory is scanned once, then sizes are tracked
+        with override_settings(METADATA_STORE_PATH=self.store), \
+                mock.patch('tardis.filters.results.os.walk',
+                           wraps=os.walk) as walk:
+            self.cache.put('aa', {'name': 'sample'}, 'x.pdf')
+            self.cache.put('ab', {'name': 'sample'}, 'x.pdf')
+            self.cache.put('ac', {'name': 'sample'}, 'x.pdf')
+            self.assertEqual(walk.call_count, 1)
+            self.assertEqual(self.cache.size, sum(
+                os.path.getsize(self.cache.get_entry_path(key))
+                for key in ('aa', 'ab', 'ac')))
+
+            # Going over max_size scans and evicts
+            self.cache.max_size = self.cache.size
+            self.cache.put('ad', {'name': 'sample'}, 'x.pdf')
+            self.assertEqual(walk.call_count, 2)
+            self.assertLessEqual(self.cache.size, self.cache.max_size)
+            self.assertIsNone(self.cache.get('aa', 1, 'x.pdf', 'a/x.pdf'))
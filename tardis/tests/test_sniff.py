@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+from django.test import TransactionTestCase, override_settings
+
+from tardis.filters.helpers import get_filters
+from tardis.filters.sniff import sniff_filters
+from tardis.tasks import apply_filters
+from tardis.synthetic import write_smv
+
+
+class SniffFiltersTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def get_assets_file(self, filename):
+        return os.path.join(os.path.dirname(__file__), 'assets', filename)
+
+    def write(self, filename, data):
+        path = os.path.join(self.path, filename)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def get_names(self, filename):
+        return [f[1][0] for f in sniff_filters(filename,
+                                               get_filters(filename))]
+
+    def testSmv(self):
+        filename = os.path.join(self.path, 'frame.img')
+        write_smv(filename, 64)
+        self.assertEqual(self.get_names(filename), ['IMG'])
+
+    def testAnalyze(self):
+        # Raw pixels may be an Analyze image, but not a diffraction image
+        filename = self.write('brain.img', b'\0\1\2\3' * 1024)
+        self.assertEqual(self.get_names(filename), ['Bioformats'])
+
+    def testText(self):
+        filename = self.write('notes.txt', b'Some notes\n' * 10)
+        self.assertEqual(self.get_names(filename), [])
+        filename = self.write('notes.img', b'Some notes\n' * 10)
+        self.assertEqual(self.get_names(filename), [])
+        filename = self.write(
+            'image.xml', b'<?xml version="1.0"?><OME xmlns="x"></OME>')
+        self.assertEqual(self.get_names(filename), ['Bioformats'])
+
+    def testBrightPixels(self):
+        # 8-bit pixel data is not text, whatever its range
+        rng = np.random.RandomState(0)
+        for low, high in ((0xa0, 0x100), (0x20, 0x7f)):
+            data = rng.randint(low, high, 4096).astype(np.uint8).tobytes()
+            filename = self.write('frame.raw', data)
+            self.assertEqual(self.get_names(filename), ['Bioformats'])
+
+    def testCsv(self):
+        # Latin-1 and tables without a line break in the header
+        filename = self.write('latin.csv', 'Température,n\n1,2\n'.encode(
+            'latin-1'))
+        self.assertEqual(self.get_names(filename), ['CSV'])
+        filename = self.write('wide.csv', b','.join(
+            b'column%d' % c for c in range(1000)))
+        self.assertEqual(self.get_names(filename), ['CSV'])
+        filename = self.write('binary.csv', b'\0\1\2' * 100)
+        self.assertEqual(self.get_names(filename), [])
+
+    def testAssets(self):
+        for filename, names in (('sample.pdf', ['PDF']),
+                                ('sample.xlsx', ['XLSX']),
+                                ('sample.csv', ['CSV']),
+                                ('sample.jpg', ['Bioformats'])):
+            self.assertEqual(self.get_names(self.get_assets_file(filename)),
+                             names)
+
+    def testMisnamed(self):
+        for filename in ('a.pdf', 'a.xlsx', 'a.fcs'):
+            filename = self.write(filename, b'\0\1\2' * 100)
+            self.assertEqual(self.get_names(filename), [])
+        filename = self.write('a.fcs', b'FCS3.1    58    1024')
+        self.assertEqual(self.get_names(filename), ['FCS'])
+
+    def testMissing(self):
+        filename = os.path.join(self.path, 'missing.pdf')
+        self.assertEqual(self.get_names(filename), ['PDF'])
+
+    @override_settings(FILTER_SNIFF_BYTES=0)
+    def testDisabled(self):
+        filename = self.write('notes.img', b'Some notes\n')
+        self.assertEqual(self.get_names(filename), ['Bioformats', 'IMG'])
+
+    @mock.patch('tardis.tasks.run_filter.apply_async')
+    def testApplyFilters(self, apply_async):
+        filename = os.path.join(self.path, 'frame.img')
+        write_smv(filename, 64)
+        apply_filters(1, True, filename, 'ds/frame.img')
+        calls = apply_async.call_args_list
+        self.assertEqual([c[1]['args'][0][1][0] for c in calls], ['IMG'])
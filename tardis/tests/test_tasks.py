@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+
+from tardis.tasks import apply_filters, apply_filters_batch, \
+    run_filter_batch
+
+
+class ApplyFiltersBatchTestCase(TransactionTestCase):
+
+    @override_settings(FILTER_BATCH_SIZE=2)
+    @mock.patch('tardis.tasks.run_filter_batch.apply_async')
+    def testGrouping(self, apply_async):
+        datafiles = [
+            [1, True, '/store/ds/a.pdf', 'ds/a.pdf'],
+            [2, True, '/store/ds/b.pdf', 'ds/b.pdf'],
+            [3, True, '/store/ds/c.pdf', 'ds/c.pdf'],
+            [4, True, '/store/ds/d.csv', 'ds/d.csv'],
+            [5, False, '/store/ds/e.csv', 'ds/e.csv'],
+            [6, True, '/store/ds/f.unknown', 'ds/f.unknown']
+        ]
+        apply_filters_batch(datafiles)
+
+        calls = [c[1]['args'] for c in apply_async.call_args_list]
+        self.assertEqual(len(calls), 3)
+
+        # PDF files are split into chunks of 2
+        self.assertEqual(calls[0][0][1][0], 'PDF')
+        self.assertEqual([df[0] for df in calls[0][1]], [1, 2])
+        self.assertEqual(calls[1][0][1][0], 'PDF')
+        self.assertEqual([df[0] for df in calls[1][1]], [3])
+
+        # Unverified CSV file is skipped
+        self.assertEqual(calls[2][0][1][0], 'CSV')
+        self.assertEqual(calls[2][1], [[4, '/store/ds/d.csv', 'ds/d.csv']])
+
+    @mock.patch('tardis.tasks.process_datafile')
+    @mock.patch('tardis.tasks.get_filter')
+    def testRunBatch(self, get_filter, process_datafile):
+        filter = (('tardis.filters.pdf.pdf.make_filter', ['pdf']),
+                  ('PDF', 'http://tardis.edu.au/schemas/pdf/1'))
+        run_filter_batch(filter, [[1, '/store/ds/a.pdf', 'ds/a.pdf'],
+                                  [2, '/store/ds/b.pdf', 'ds/b.pdf']])
+
+        # Filter is looked up once per chunk
+        self.assertEqual(get_filter.call_count, 1)
+        self.assertEqual(process_datafile.call_count, 2)
+
+
+class FilterRoutesTestCase(TransactionTestCase):
+
+    @override_settings(FILTER_ROUTES={
+        'Bioformats': {'queue': 'filters.jvm', 'priority': 3}})
+    @mock.patch('tardis.tasks.run_filter.apply_async')
+    def testRoutes(self, apply_async):
+        apply_filters(1, True, '/store/ds/a.img', 'ds/a.img')
+
+        calls = apply_async.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0][1]['args'][0][1][0], 'Bioformats')
+        self.assertEqual(calls[0][1]['queue'], 'filters.jvm')
+        self.assertEqual(calls[0][1]['priority'], 3)
+
+        # Filters without route use default queue
+        self.assertEqual(calls[1][1]['args'][0][1][0], 'IMG')
+        self.assertNotIn('queue', calls[1][1])